@@ -97,6 +97,13 @@ export const EventTypesSchema = z.discriminatedUnion("type", [
     GeofenceEventReadSchema
 ]);
 
+// Cursor-paginated list, pass `next_cursor` back as `cursor` for the next page.
+const PageSchema = <T extends z.ZodTypeAny>(item: T) =>
+    z.object({
+        items: z.array(item),
+        next_cursor: z.string().nullable()
+    });
+
 export type VehicleCreate = z.infer<typeof VehicleCreateSchema>;
 export type VehicleUpdate = z.infer<typeof VehicleUpdateSchema>;
 export type VehicleRead = z.infer<typeof VehicleReadSchema>;
@@ -175,6 +182,10 @@ export class VehicleClient {
         return this.request("GET", "/vehicles/", z.array(UuidSchema), undefined, { active });
     }
 
+    async getVehiclesSnapshot() {
+        return this.request("GET", "/vehicles_snapshot", z.array(VehicleReadSchema));
+    }
+
     async getVehicle(id: string) {
         return this.request("GET", `/vehicles/${id}`, VehicleReadSchema);
     }
@@ -232,12 +243,12 @@ export class VehicleClient {
     // Time Series / Events
     async getVehiclePositions(
         id: string,
-        filters?: { start_date?: Date; end_date?: Date; limit?: number }
+        filters?: { start_date?: Date; end_date?: Date; limit?: number; cursor?: string }
     ) {
         return this.request(
             "GET",
             `/vehicle_positions/${id}`,
-            z.array(PosReadSchema),
+            PageSchema(PosReadSchema),
             undefined,
             filters
         );
@@ -245,12 +256,12 @@ export class VehicleClient {
 
     async getVehicleEvents(
         id: string,
-        filters?: { start_date?: Date; end_date?: Date; limit?: number }
+        filters?: { start_date?: Date; end_date?: Date; limit?: number; cursor?: string }
     ) {
         return this.request(
             "GET",
             `/vehicle_events/${id}`,
-            z.array(EventTypesSchema),
+            PageSchema(EventTypesSchema),
             undefined,
             filters
         );
@@ -258,12 +269,12 @@ export class VehicleClient {
 
     async getGeofenceEvents(
         id: string,
-        filters?: { start_date?: Date; end_date?: Date; limit?: number }
+        filters?: { start_date?: Date; end_date?: Date; limit?: number; cursor?: string }
     ) {
         return this.request(
             "GET",
             `/geofence_events/${id}`,
-            z.array(EventTypesSchema),
+            PageSchema(EventTypesSchema),
             undefined,
             filters
         );
@@ -20,8 +20,8 @@ export const load: PageServerLoad = async ({ params, fetch }) => {
         return {
             vehicle,
             // Sort server-side to reduce client processing
-            events: events.sort((a, b) => b.ts.getTime() - a.ts.getTime()),
-            positions: positions.sort((a, b) => a.ts.getTime() - b.ts.getTime())
+            events: events.items.sort((a, b) => b.ts.getTime() - a.ts.getTime()),
+            positions: positions.items.sort((a, b) => a.ts.getTime() - b.ts.getTime())
         };
     } catch (e) {
         console.error(`Error loading vehicle ${id}:`, e);
@@ -0,0 +1,78 @@
+"""Compares a rebalance with HashRing against the previous per-vehicle ring scan,
+and the load spread of plain and bounded-load ownership.
+
+Run with `uv run python bench/bench_hash_ring.py`.
+"""
+
+from collections.abc import Callable
+from hashlib import md5
+from time import perf_counter
+from uuid import uuid4
+
+from vehicle_controller.worker.hash_ring import HashRing, max_mean_load
+
+
+def _get_hash(key: str) -> int:
+    return int(md5(key.encode("utf-8")).hexdigest(), 16)
+
+
+def scan_owner(worker_ids: list[str], resource_id: str) -> str:
+    # Ring rebuilt, sorted and scanned for every resource, as before HashRing.
+    worker_ring = sorted((_get_hash(uid), uid) for uid in worker_ids)
+    resource_hash = _get_hash(resource_id)
+    for w_hash, w_id in worker_ring:
+        if w_hash >= resource_hash:
+            return w_id
+    return worker_ring[0][1]
+
+
+def best_of[T](fn: Callable[[], T], repeat: int = 3) -> tuple[T, float]:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        ret = fn()
+        times.append(perf_counter() - start)
+    return ret, min(times)
+
+
+def rebalance_scan(worker_ids: list[str], vehicle_ids: list[str]) -> list[str]:
+    return [scan_owner(worker_ids, vid) for vid in vehicle_ids]
+
+
+def rebalance_ring(worker_ids: list[str], vehicle_ids: list[str]) -> dict[str, str]:
+    ring = HashRing(worker_ids)
+    return {vid: ring.owner(vid) or "" for vid in vehicle_ids}
+
+
+def rebalance_bounded(
+    worker_ids: list[str], vehicle_ids: list[str], load_factor: float
+) -> dict[str, str]:
+    return HashRing(worker_ids).assign(vehicle_ids, load_factor)
+
+
+def run(n_vehicles: int, n_workers: int):
+    worker_ids = [str(uuid4()) for _ in range(n_workers)]
+    vehicle_ids = [str(uuid4()) for _ in range(n_vehicles)]
+
+    _, t_scan = best_of(lambda: rebalance_scan(worker_ids, vehicle_ids))
+    owners, t_ring = best_of(lambda: rebalance_ring(worker_ids, vehicle_ids))
+    single = HashRing(worker_ids, vnodes=1)
+    single_owners = {vid: single.owner(vid) or "" for vid in vehicle_ids}
+    bounded, t_bounded = best_of(
+        lambda: rebalance_bounded(worker_ids, vehicle_ids, 1.25)
+    )
+
+    print(
+        f"{n_vehicles:>7} vehicles, {n_workers:>3} workers: "
+        f"scan {t_scan * 1000:9.1f} ms, ring {t_ring * 1000:7.1f} ms "
+        f"({t_scan / t_ring:5.1f}x), bounded {t_bounded * 1000:7.1f} ms; "
+        f"max/mean load {max_mean_load(single_owners, worker_ids):.2f} single, "
+        f"{max_mean_load(owners, worker_ids):.2f} plain, "
+        f"{max_mean_load(bounded, worker_ids):.2f} bounded"
+    )
+
+
+if __name__ == "__main__":
+    for n_workers in [4, 32]:
+        for n_vehicles in [1000, 10000, 100000]:
+            run(n_vehicles, n_workers)
@@ -11,13 +11,14 @@ from vehicle_controller.coordinator.settings import CoordinatorSettings
 from vehicle_controller.nats import get_nats_from_fastapi
 from vehicle_controller.resilience import run_background_task
 from vehicle_controller.settings import get_settings_from_fastapi
+from vehicle_controller.shared import WorkerIds
 
 
 @asynccontextmanager
 async def _lifespan(app: FastAPI):
     settings = get_settings_from_fastapi(app, t=CoordinatorSettings)
     nc = await get_nats_from_fastapi(app)
-    q_worker_ids = AsyncValue[list[str]]([])
+    q_worker_ids = AsyncValue[WorkerIds](WorkerIds(worker_ids=[]))
 
     async with asyncio.TaskGroup() as tg:
         task_coordinator = tg.create_task(
@@ -26,8 +27,12 @@ async def _lifespan(app: FastAPI):
                     nc,
                     f"{settings.sub_heartbeat}.req",
                     f"{settings.sub_heartbeat}.resp",
+                    f"{settings.sub_veh_deltas}.b",
+                    f"{settings.sub_veh_deltas}.l",
                     settings.heartbeat_interval,
                     settings.heartbeat_missed_limit,
+                    settings.membership_settle_window,
+                    settings.membership_settle_max_delay,
                     q_worker_ids,
                 ),
                 "coordinator",
@@ -1,45 +1,110 @@
 import asyncio
-from time import time
+from time import time, time_ns
 
 from vehicle_controller.async_value import AsyncValue
 from vehicle_controller.nats import NATS, Msg, with_cleanup_sub
-from vehicle_controller.shared import Heartbeat
+from vehicle_controller.shared import (
+    DeltaResponseAdapter,
+    Heartbeat,
+    ResponseDelete,
+    ResponseUpdate,
+    WorkerIds,
+)
+
+
+async def wait_settled(changed: asyncio.Event, window: float, max_delay: float):
+    """Waits for `changed` to be set and then for `window` seconds without it being
+    set again, but no longer than `max_delay` seconds after the first change."""
+    await changed.wait()
+    deadline = asyncio.get_running_loop().time() + max_delay
+    try:
+        async with asyncio.timeout_at(deadline):
+            while changed.is_set():
+                changed.clear()
+                try:
+                    async with asyncio.timeout(window):
+                        await changed.wait()
+                except TimeoutError:
+                    pass
+    except TimeoutError:
+        changed.clear()
 
 
 async def run_coordinator(
     nc: NATS,
     sub_heartbeat_req: str,
     sub_heartbeat_resp: str,
+    sub_veh_broadcast_deltas: str,
+    sub_veh_listen: str,
     heartbeat_interval: float,
     heartbeat_missed_limit: int,
-    out: AsyncValue[list[str]],
+    settle_window: float,
+    settle_max_delay: float,
+    out: AsyncValue[WorkerIds],
 ):
     clients: dict[str, float] = {}
+    # Published with the workers, so they all spread the same vehicles. A vehicle
+    # created or deleted also leads to a new membership.
+    vehicle_ids: set[str] = set()
+    changed = asyncio.Event()
+    # Epochs only increase, also across coordinator restarts.
+    epoch = time_ns() // 1000
 
     async def send_clients():
-        await out.put(list(clients))
+        nonlocal epoch
+        epoch += 1
+        await out.put(
+            WorkerIds(
+                worker_ids=list(clients),
+                vehicle_ids=sorted(vehicle_ids),
+                epoch=epoch,
+            )
+        )
+
+    async def send_settled_clients():
+        # The first membership waits for one heartbeat round, so workers aren't
+        # told about an empty or partial list before they could answer.
+        await asyncio.sleep(heartbeat_interval)
+        changed.set()
+        while True:
+            await wait_settled(changed, settle_window, settle_max_delay)
+            await send_clients()
 
     async def message_handler(msg: Msg):
-        should_send = False
         hb = Heartbeat.model_validate_json(msg.data)
 
         if hb.active:
             if hb.worker_id not in clients:
-                should_send = True
+                changed.set()
             clients[hb.worker_id] = time()
         else:
             if hb.worker_id in clients:
-                should_send = True
+                changed.set()
                 del clients[hb.worker_id]
 
-        if should_send:
-            await send_clients()
-
-    await send_clients()
+    async def on_delta(msg: Msg):
+        match delta := DeltaResponseAdapter.validate_json(msg.data):
+            case ResponseUpdate():
+                added = {veh.vehicle_id for veh in delta.vehicles} - vehicle_ids
+                if added:
+                    vehicle_ids.update(added)
+                    changed.set()
+            case ResponseDelete():
+                removed = vehicle_ids.intersection(delta.vehicle_ids)
+                if removed:
+                    vehicle_ids.difference_update(removed)
+                    changed.set()
 
-    async with with_cleanup_sub(
-        await nc.subscribe(sub_heartbeat_resp, cb=message_handler)
+    async with (
+        asyncio.TaskGroup() as tg,
+        with_cleanup_sub(await nc.subscribe(sub_heartbeat_resp, cb=message_handler)),
+        with_cleanup_sub(await nc.subscribe(sub_veh_broadcast_deltas, cb=on_delta)),
     ):
+        snapshot = ResponseUpdate.model_validate_json(
+            (await nc.request(sub_veh_listen, b"")).data
+        )
+        vehicle_ids.update(veh.vehicle_id for veh in snapshot.vehicles)
+        tg.create_task(send_settled_clients())
         while True:
             await nc.publish(sub_heartbeat_req, b"")
 
@@ -56,6 +121,6 @@ async def run_coordinator(
                 del clients[cid]
 
             if to_evict:
-                await send_clients()
+                changed.set()
 
             await asyncio.sleep(heartbeat_interval)
@@ -4,3 +4,9 @@ from vehicle_controller.settings import Settings
 class CoordinatorSettings(Settings):
     heartbeat_interval: float
     heartbeat_missed_limit: int
+
+    # Membership changes are published once no worker joined or left for this
+    # many seconds, so a rolling deploy leads to few rebalances. A change is
+    # published at most this many seconds late while workers keep coming and going.
+    membership_settle_window: float = 3.0
+    membership_settle_max_delay: float = 30.0
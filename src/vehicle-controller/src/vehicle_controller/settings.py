@@ -17,6 +17,16 @@ class Settings(BaseSettings):
     def sub_worker_list(self) -> str:
         return f"{self.subject_base}.wl"
 
+    @computed_field
+    @property
+    def sub_veh_base(self) -> str:
+        return f"{self.subject_base}.veh"
+
+    @computed_field
+    @property
+    def sub_veh_deltas(self) -> str:
+        return f"{self.sub_veh_base}.deltas"
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
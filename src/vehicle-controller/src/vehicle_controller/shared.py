@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Any
+
+from pydantic import BaseModel, TypeAdapter
 
 
 class Heartbeat(BaseModel):
@@ -8,3 +10,27 @@ class Heartbeat(BaseModel):
 
 class WorkerIds(BaseModel):
     worker_ids: list[str]
+    # Vehicles are spread over the workers by their load as of this list, so all
+    # workers compute the same ownership, whatever deltas they have seen so far.
+    vehicle_ids: list[str] = []
+    # Increases with every published membership, so workers can skip a list they
+    # already applied.
+    epoch: int = 0
+
+
+class VehicleConfig(BaseModel):
+    vehicle_id: str
+    vtype: str
+    vdata: Any
+
+
+class ResponseUpdate(BaseModel):
+    vehicles: list[VehicleConfig]
+
+
+class ResponseDelete(BaseModel):
+    vehicle_ids: list[str]
+
+
+DeltaResponse = ResponseUpdate | ResponseDelete
+DeltaResponseAdapter = TypeAdapter[DeltaResponse](DeltaResponse)
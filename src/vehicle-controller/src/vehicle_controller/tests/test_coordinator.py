@@ -0,0 +1,95 @@
+import asyncio
+
+from vehicle_controller.async_value import AsyncValue
+from vehicle_controller.coordinator.coordinator import run_coordinator, wait_settled
+from vehicle_controller.shared import (
+    Heartbeat,
+    ResponseUpdate,
+    VehicleConfig,
+    WorkerIds,
+)
+
+
+def test_wait_settled_coalesces_bursts():
+    async def run(changes: int, interval: float) -> float:
+        changed = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        async def burst():
+            for _ in range(changes):
+                changed.set()
+                await asyncio.sleep(interval)
+
+        start = loop.time()
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(burst())
+            await wait_settled(changed, 0.05, 0.3)
+            elapsed = loop.time() - start
+        return elapsed
+
+    # Settles one window after the last of several quick changes.
+    assert 0.1 <= asyncio.run(run(5, 0.02)) < 0.25
+    # Continuous changes are published after the maximum delay.
+    assert 0.3 <= asyncio.run(run(40, 0.02)) < 0.5
+
+
+class _FakeNats:
+    class _Msg:
+        def __init__(self, data: bytes):
+            self.data = data
+
+    class _Sub:
+        async def unsubscribe(self):
+            pass
+
+    def __init__(self, worker_ids: list[str], vehicle_ids: list[str]):
+        self.worker_ids = worker_ids
+        self.vehicle_ids = vehicle_ids
+        self.subs = {}
+
+    async def subscribe(self, subject: str, cb):
+        self.subs[subject] = cb
+        return self._Sub()
+
+    async def request(self, subject: str, data: bytes):
+        snapshot = ResponseUpdate(
+            vehicles=[
+                VehicleConfig(vehicle_id=vid, vtype="test", vdata=None)
+                for vid in self.vehicle_ids
+            ]
+        )
+        return self._Msg(snapshot.model_dump_json().encode())
+
+    async def publish(self, subject: str, data: bytes):
+        for worker_id in self.worker_ids:
+            hb = Heartbeat(worker_id=worker_id, active=True)
+            await self.subs["resp"](self._Msg(hb.model_dump_json().encode()))
+
+
+def test_first_membership_waits_for_a_heartbeat_round():
+    async def run() -> WorkerIds:
+        out = AsyncValue(WorkerIds(worker_ids=[]))
+        nc = _FakeNats(["a", "b"], ["v2", "v1"])
+        task = asyncio.create_task(
+            run_coordinator(
+                nc,  # type: ignore[arg-type]
+                "req",
+                "resp",
+                "deltas",
+                "listen",
+                0.05,
+                3,
+                0.02,
+                0.2,
+                out,
+            )
+        )
+        _, wait = out.get()
+        await wait()
+        task.cancel()
+        return out.get()[0]
+
+    worker_ids = asyncio.run(run())
+    assert sorted(worker_ids.worker_ids) == ["a", "b"]
+    assert worker_ids.vehicle_ids == ["v1", "v2"]
+    assert worker_ids.epoch > 0
@@ -0,0 +1,45 @@
+from math import ceil
+from uuid import uuid4
+
+from vehicle_controller.worker.hash_ring import (
+    HashRing,
+    max_mean_load,
+    ownership_diff,
+)
+
+
+def test_ring_is_deterministic_and_moves_little_on_join():
+    workers = [str(uuid4()) for _ in range(10)]
+    vehicles = [str(uuid4()) for _ in range(5000)]
+
+    ring = HashRing(workers)
+    owners = {vid: ring.owner(vid) for vid in vehicles}
+    assert owners == {vid: HashRing(reversed(workers)).owner(vid) for vid in vehicles}
+    assert set(owners.values()) == set(workers)
+
+    joined = HashRing([*workers, str(uuid4())])
+    moved = sum(owners[vid] != joined.owner(vid) for vid in vehicles)
+    assert moved < len(vehicles) * 0.2
+    assert HashRing(()).owner(vehicles[0]) is None
+
+
+def test_bounded_assignment_respects_capacity():
+    workers = [str(uuid4()) for _ in range(7)]
+    vehicles = [str(uuid4()) for _ in range(3000)]
+
+    ring = HashRing(workers, vnodes=10)
+    assignment = ring.assign(vehicles, 1.1)
+    assert assignment == HashRing(reversed(workers), vnodes=10).assign(
+        reversed(vehicles), 1.1
+    )
+    assert assignment.keys() == set(vehicles)
+    assert max_mean_load(assignment, workers) <= ceil(1.1 * 3000 / 7) / (3000 / 7)
+    # Too small a factor would leave no room for some vehicles.
+    assert ring.assign(vehicles, 0.5).keys() == set(vehicles)
+
+
+def test_ownership_diff():
+    diff = ownership_diff(["a", "b", "c"], ["b", "c", "d"])
+    assert diff.gained == {"d"}
+    assert diff.lost == {"a"}
+    assert diff.unchanged == {"b", "c"}
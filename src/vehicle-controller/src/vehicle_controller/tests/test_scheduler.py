@@ -0,0 +1,35 @@
+import asyncio
+from collections import Counter
+
+from vehicle_controller.worker.scheduler import TickScheduler
+
+
+class _Stop(Exception):
+    pass
+
+
+def test_scheduler_spreads_items_and_visits_each_once_per_period():
+    scheduler = TickScheduler[int](period=0.1, slots=10)
+    for i in range(95):
+        scheduler.add(str(i), i)
+    scheduler.remove("3")
+    scheduler.add("4", 1004)
+
+    ticks: list[list[int]] = []
+
+    async def on_tick(items: list[int]):
+        ticks.append(items)
+        if len(ticks) == 10:
+            raise _Stop
+
+    try:
+        asyncio.run(scheduler.run(on_tick))
+    except _Stop:
+        pass
+
+    assert len(scheduler) == 94
+    assert len(ticks) == 10
+    assert {len(t) for t in ticks} <= {9, 10}
+    seen = Counter(i for t in ticks for i in t)
+    assert set(seen.values()) == {1}
+    assert 3 not in seen and 4 not in seen and 1004 in seen
@@ -0,0 +1,124 @@
+import asyncio
+from types import SimpleNamespace
+
+from vehicle_controller.async_value import AsyncValue
+from vehicle_controller.shared import (
+    ResponseDelete,
+    ResponseUpdate,
+    VehicleConfig,
+    WorkerIds,
+)
+from vehicle_controller.worker.vehicle import (
+    VehicleCmdImmobilizer,
+    VehicleCmdImmobilizerCorrelation,
+)
+from vehicle_controller.worker.workers import run_workers
+
+
+def vehicle(vid: str) -> VehicleConfig:
+    return VehicleConfig(
+        vehicle_id=vid, vtype="test", vdata={"lat": 0, "lon": 0, "std": 0}
+    )
+
+
+class _FakeNats:
+    class _Sub:
+        async def unsubscribe(self):
+            pass
+
+    def __init__(self, snapshot: ResponseUpdate):
+        self.snapshot = snapshot
+        self.subs = {}
+        self.published: list[str] = []
+
+    async def subscribe(self, subject: str, cb):
+        self.subs[subject] = cb
+        return self._Sub()
+
+    async def request(self, subject: str, data: bytes):
+        return SimpleNamespace(data=self.snapshot.model_dump_json().encode())
+
+    async def publish(self, subject: str, data: bytes):
+        self.published.append(subject)
+
+
+def test_workers_agree_on_owners_whatever_the_order_of_deltas():
+    snapshot = ResponseUpdate(vehicles=[vehicle(f"v{i}") for i in range(50)])
+    membership = WorkerIds(
+        worker_ids=["a", "b"],
+        vehicle_ids=[f"v{i}" for i in range(1, 60)],
+        epoch=1,
+    )
+    deltas = [
+        ResponseUpdate(vehicles=[vehicle(f"v{i}") for i in range(50, 60)]),
+        ResponseDelete(vehicle_ids=["v0"]),
+    ]
+    # Created after the membership was published.
+    late = ResponseUpdate(vehicles=[vehicle(f"x{i}") for i in range(10)])
+    cmd = VehicleCmdImmobilizer(
+        correlation=VehicleCmdImmobilizerCorrelation(user_id=None, geofence_id=None),
+        active=True,
+    )
+
+    async def run(worker_id: str, membership_first: bool) -> set[str]:
+        nc = _FakeNats(snapshot)
+        q_worker_ids = AsyncValue(WorkerIds(worker_ids=[]))
+        task = asyncio.create_task(
+            run_workers(
+                nc,  # type: ignore[arg-type]
+                worker_id,
+                q_worker_ids,
+                "deltas",
+                "listen",
+                "cmd",
+                "status",
+                10,
+                1.1,
+                60.0,
+                10,
+            )
+        )
+        while "deltas" not in nc.subs or "cmd.*" not in nc.subs:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        async def deliver_membership():
+            await q_worker_ids.put(membership)
+            await asyncio.sleep(0)
+
+        if membership_first:
+            await deliver_membership()
+        for delta in deltas:
+            await nc.subs["deltas"](
+                SimpleNamespace(data=delta.model_dump_json().encode())
+            )
+        if not membership_first:
+            await deliver_membership()
+        await nc.subs["deltas"](SimpleNamespace(data=late.model_dump_json().encode()))
+
+        # Only running vehicles answer commands.
+        nc.published.clear()
+        for vid in [
+            *membership.vehicle_ids,
+            *(veh.vehicle_id for veh in late.vehicles),
+        ]:
+            await nc.subs["cmd.*"](
+                SimpleNamespace(
+                    subject=f"cmd.{vid}", data=cmd.model_dump_json().encode()
+                )
+            )
+        task.cancel()
+        return {subject.removeprefix("status.") for subject in nc.published}
+
+    async def main():
+        return [
+            await run(worker_id, membership_first)
+            for worker_id in ("a", "b")
+            for membership_first in (True, False)
+        ]
+
+    a1, a2, b1, b2 = asyncio.run(main())
+    assert a1 == a2
+    assert b1 == b2
+    assert not a1 & b1
+    assert a1 | b1 == {*membership.vehicle_ids, *(f"x{i}" for i in range(10))}
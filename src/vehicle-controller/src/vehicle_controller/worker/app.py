@@ -9,6 +9,7 @@ from vehicle_controller.async_value import AsyncValue
 from vehicle_controller.nats import get_nats_from_fastapi
 from vehicle_controller.resilience import run_background_task
 from vehicle_controller.settings import get_settings_from_fastapi
+from vehicle_controller.shared import WorkerIds
 from vehicle_controller.worker.heartbeat import run_heartbeat
 from vehicle_controller.worker.listener import run_listener
 from vehicle_controller.worker.settings import WorkerSettings
@@ -20,7 +21,7 @@ async def _lifespan(app: FastAPI):
     settings = get_settings_from_fastapi(app, t=WorkerSettings)
     nc = await get_nats_from_fastapi(app)
     worker_id = str(uuid4())
-    q_worker_ids = AsyncValue[list[str]]([])
+    q_worker_ids = AsyncValue[WorkerIds](WorkerIds(worker_ids=[]))
 
     async with asyncio.TaskGroup() as tg:
         task_heartbeat = tg.create_task(
@@ -55,6 +56,10 @@ async def _lifespan(app: FastAPI):
                     f"{settings.sub_veh_deltas}.l",
                     settings.sub_veh_cmd,
                     settings.sub_veh_status,
+                    settings.worker_vnodes,
+                    settings.worker_load_factor,
+                    settings.vehicle_status_interval,
+                    settings.vehicle_status_slots,
                 ),
                 "workers",
             )
@@ -0,0 +1,77 @@
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Collection, Iterable, Mapping
+from dataclasses import dataclass
+from hashlib import md5
+from math import ceil
+
+
+def _hash(key: str) -> int:
+    return int(md5(key.encode("utf-8")).hexdigest(), 16)
+
+
+class HashRing:
+    """Consistent hash ring mapping resource ids to nodes.
+
+    Every node is placed on the ring at `vnodes` points, and a resource belongs to
+    the node at the first point at or after its own hash, wrapping around. The
+    ring is built once per membership and only depends on the set of nodes, so
+    every worker computes the same ownership.
+    """
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = 100) -> None:
+        points = sorted(
+            (_hash(f"{node}#{i}"), node) for node in set(nodes) for i in range(vnodes)
+        )
+        self.nodes = frozenset(node for _, node in points)
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, resource_id: str) -> str | None:
+        if not self._hashes:
+            return None
+        i = bisect_left(self._hashes, _hash(resource_id))
+        return self._owners[i % len(self._owners)]
+
+    def assign(self, resource_ids: Iterable[str], load_factor: float) -> dict[str, str]:
+        """Consistent hashing with bounded loads.
+
+        No node gets more than `load_factor` times the mean number of resources,
+        rounded up, and factors below 1 count as 1 so everything fits. Resources
+        are placed in the order of their hash, each at the
+        first point at or after its hash whose node still has room. The result
+        only depends on the set of resources and nodes.
+        """
+        if not self._hashes:
+            return {}
+        keyed = sorted((_hash(rid), rid) for rid in set(resource_ids))
+        capacity = ceil(max(load_factor, 1.0) * len(keyed) / len(self.nodes))
+        loads = Counter[str]()
+        ret: dict[str, str] = {}
+        for h, rid in keyed:
+            i = bisect_left(self._hashes, h)
+            while loads[node := self._owners[i % len(self._owners)]] >= capacity:
+                i += 1
+            loads[node] += 1
+            ret[rid] = node
+        return ret
+
+
+def max_mean_load(assignment: Mapping[str, str], nodes: Collection[str]) -> float:
+    """Ratio of the largest number of resources on one node to the mean."""
+    if not assignment or not nodes:
+        return 0.0
+    loads = Counter(assignment.values())
+    return max(loads.values()) / (len(assignment) / len(nodes))
+
+
+@dataclass(frozen=True)
+class OwnershipDiff:
+    gained: frozenset[str]
+    lost: frozenset[str]
+    unchanged: frozenset[str]
+
+
+def ownership_diff(before: Iterable[str], after: Iterable[str]) -> OwnershipDiff:
+    before, after = frozenset(before), frozenset(after)
+    return OwnershipDiff(after - before, before - after, before & after)
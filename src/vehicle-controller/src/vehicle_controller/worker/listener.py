@@ -9,10 +9,19 @@ async def run_listener(
     nc: NATS,
     sub_broadcast: str,
     sub_listen: str,
-    out: AsyncValue[list[str]],
+    out: AsyncValue[WorkerIds],
 ):
+    applied_epoch = -1
+
     async def on_msg(msg: Msg):
-        await out.put(WorkerIds.model_validate_json(msg.data).worker_ids)
+        nonlocal applied_epoch
+        worker_ids = WorkerIds.model_validate_json(msg.data)
+        # The initial request and the broadcast can deliver the same membership,
+        # and a late reply can be older than the last broadcast.
+        if worker_ids.epoch <= applied_epoch:
+            return
+        applied_epoch = worker_ids.epoch
+        await out.put(worker_ids)
 
     async with with_cleanup_sub(await nc.subscribe(sub_broadcast, cb=on_msg)):
         await on_msg(await nc.request(sub_listen, b""))
@@ -0,0 +1,48 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+
+
+class TickScheduler[T]:
+    """Timing wheel handing out every item once per `period` from a single loop.
+
+    The period is split into `slots` ticks and each item sits in one slot. A new
+    item goes into the slot with the fewest items, so about the same number of
+    items is due on every tick. Ticks are scheduled against absolute deadlines,
+    so a slow tick delays the following ones without skipping any slot.
+    """
+
+    def __init__(self, period: float, slots: int) -> None:
+        self._tick = period / slots
+        self._slots: list[dict[str, T]] = [{} for _ in range(slots)]
+        self._slot_of: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._slot_of
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._slot_of)
+
+    def add(self, key: str, item: T) -> None:
+        """Adds an item, or replaces the item with the same key in its slot."""
+        if (slot := self._slot_of.get(key)) is None:
+            slot = min(range(len(self._slots)), key=lambda i: len(self._slots[i]))
+            self._slot_of[key] = slot
+        self._slots[slot][key] = item
+
+    def remove(self, key: str) -> None:
+        if (slot := self._slot_of.pop(key, None)) is not None:
+            del self._slots[slot][key]
+
+    async def run(self, on_tick: Callable[[list[T]], Awaitable[None]]):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        slot = 0
+        while True:
+            if items := list(self._slots[slot].values()):
+                await on_tick(items)
+            slot = (slot + 1) % len(self._slots)
+            deadline += self._tick
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
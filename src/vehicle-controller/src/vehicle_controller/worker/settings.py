@@ -1,18 +1,20 @@
-from pydantic import computed_field
+from pydantic import Field, computed_field
 
 from vehicle_controller.settings import Settings
 
 
 class WorkerSettings(Settings):
-    @computed_field
-    @property
-    def sub_veh_base(self) -> str:
-        return f"{self.subject_base}.veh"
+    # Vehicles are spread over the workers by consistent hashing, with each worker
+    # placed on the ring this many times. No worker owns more than this factor
+    # times the mean number of vehicles, so the factor can't be below 1. Both
+    # must be equal on all workers.
+    worker_vnodes: int = Field(100, ge=1)
+    worker_load_factor: float = Field(1.25, ge=1.0)
 
-    @computed_field
-    @property
-    def sub_veh_deltas(self) -> str:
-        return f"{self.sub_veh_base}.deltas"
+    # Every owned vehicle reports its status once per this many seconds. The
+    # vehicles are spread over this many ticks within that period.
+    vehicle_status_interval: float = 5.0
+    vehicle_status_slots: int = 50
 
     @computed_field
     @property
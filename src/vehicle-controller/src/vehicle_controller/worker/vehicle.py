@@ -1,18 +1,14 @@
-import asyncio
 import random
+from dataclasses import dataclass
 from datetime import UTC, datetime
-from typing import Any, Literal
+from typing import Literal
 from uuid import UUID
 
 from pydantic import BaseModel, TypeAdapter
 
 from vehicle_controller.nats import NATS, Msg, with_cleanup_sub
-
-
-class VehicleConfig(BaseModel):
-    vehicle_id: str
-    vtype: str
-    vdata: Any
+from vehicle_controller.shared import VehicleConfig
+from vehicle_controller.worker.scheduler import TickScheduler
 
 
 class _Vdata(BaseModel):
@@ -50,20 +46,44 @@ VehicleStatus = VehicleStatusPos | VehicleStatusImmobilizer
 VehicleStatusAdapter = TypeAdapter[VehicleStatus](VehicleStatus)
 
 
-async def run_vehicle_controller(
+@dataclass(frozen=True)
+class SimulatedVehicle:
+    vehicle_id: str
+    vdata: _Vdata
+
+    @staticmethod
+    def from_config(vehicle_config: VehicleConfig) -> "SimulatedVehicle":
+        # ran out of time to do this properly, vehicle type and behavior is hardcoded
+        if vehicle_config.vtype != "test":
+            raise ValueError(f"Unsupported vehicle type {vehicle_config.vtype!r}")
+        return SimulatedVehicle(
+            vehicle_config.vehicle_id, _Vdata.model_validate(vehicle_config.vdata)
+        )
+
+    def pos(self, ts: datetime) -> VehicleStatusPos:
+        return VehicleStatusPos(
+            lat=self.vdata.lat + random.gauss(0, self.vdata.std),
+            lon=self.vdata.lon + random.gauss(0, self.vdata.std),
+            ts=ts,
+        )
+
+
+async def run_vehicle_controllers(
     nc: NATS,
-    vehicle_config: VehicleConfig,
+    vehicles: TickScheduler[SimulatedVehicle],
     sub_veh_cmd: str,
     sub_veh_status: str,
 ):
-    # ran out of time to do this properly, vehicle type and behavior is hardcoded
-    assert vehicle_config.vtype == "test"
-    vdata = _Vdata.model_validate(vehicle_config.vdata)
+    """Reports the position of every vehicle in `vehicles` once per scheduler
+    period and answers commands for them from one wildcard subscription."""
 
     async def on_cmd_msg(msg: Msg):
+        vehicle_id = msg.subject.removeprefix(f"{sub_veh_cmd}.")
+        if vehicle_id not in vehicles:
+            return
         cmd = VehicleCmdImmobilizer.model_validate_json(msg.data)
         await nc.publish(
-            sub_veh_status,
+            f"{sub_veh_status}.{vehicle_id}",
             VehicleStatusImmobilizer(
                 correlation=cmd.correlation,
                 active=cmd.active,
@@ -73,16 +93,13 @@ async def run_vehicle_controller(
             .encode("utf-8"),
         )
 
-    async with with_cleanup_sub(await nc.subscribe(sub_veh_cmd, cb=on_cmd_msg)):
-        while True:
+    async def on_tick(due: list[SimulatedVehicle]):
+        ts = datetime.now(UTC)
+        for veh in due:
             await nc.publish(
-                sub_veh_status,
-                VehicleStatusPos(
-                    lat=vdata.lat + random.gauss(0, vdata.std),
-                    lon=vdata.lon + random.gauss(0, vdata.std),
-                    ts=datetime.now(UTC),
-                )
-                .model_dump_json()
-                .encode("utf-8"),
+                f"{sub_veh_status}.{veh.vehicle_id}",
+                veh.pos(ts).model_dump_json().encode("utf-8"),
             )
-            await asyncio.sleep(5.0)
+
+    async with with_cleanup_sub(await nc.subscribe(f"{sub_veh_cmd}.*", cb=on_cmd_msg)):
+        await vehicles.run(on_tick)
@@ -1,98 +1,83 @@
 import asyncio
-from collections.abc import Iterable
-from hashlib import md5
-
-from pydantic import BaseModel, TypeAdapter
+import logging
 
 from vehicle_controller.async_value import AsyncValue
 from vehicle_controller.nats import NATS, Msg, with_cleanup_sub
 from vehicle_controller.resilience import run_background_task
-from vehicle_controller.worker.vehicle import VehicleConfig, run_vehicle_controller
-
-
-def _belongs_to_worker(
-    worker_id: str,
-    worker_ids: Iterable[str],
-    resource_id: str,
-) -> bool:
-    print(worker_ids)
-
-    def get_hash(key: str) -> int:
-        return int(md5(key.encode("utf-8")).hexdigest(), 16)
-
-    # Calculate hashes for dictionary of {hash: worker_id}
-    worker_ring: list[tuple[int, str]] = []
-    for uid in worker_ids:
-        worker_ring.append((get_hash(uid), uid))
-
-    # Sort by hash to form the ring
-    worker_ring.sort()
-
-    resource_hash = get_hash(resource_id)
-
-    # Find the first worker with a hash >= resource_hash
-    target_worker = None
-    for w_hash, w_id in worker_ring:
-        if w_hash >= resource_hash:
-            target_worker = w_id
-            break
-
-    # Wrap around to the first worker if no worker has a higher hash
-    if target_worker is None:
-        target_worker = worker_ring[0][1]
-
-    return target_worker == worker_id
-
-
-class ResponseUpdate(BaseModel):
-    vehicles: list[VehicleConfig]
-
-
-class ResponseDelete(BaseModel):
-    vehicle_ids: list[str]
-
-
-DeltaResponse = ResponseUpdate | ResponseDelete
-DeltaResponseAdapter = TypeAdapter[DeltaResponse](DeltaResponse)
+from vehicle_controller.shared import (
+    DeltaResponseAdapter,
+    ResponseDelete,
+    ResponseUpdate,
+    VehicleConfig,
+    WorkerIds,
+)
+from vehicle_controller.worker.hash_ring import (
+    HashRing,
+    max_mean_load,
+    ownership_diff,
+)
+from vehicle_controller.worker.scheduler import TickScheduler
+from vehicle_controller.worker.vehicle import (
+    SimulatedVehicle,
+    run_vehicle_controllers,
+)
+
+logger = logging.getLogger(__name__)
 
 
 async def run_workers(
     nc: NATS,
     worker_id: str,
-    q_worker_ids: AsyncValue[list[str]],
+    q_worker_ids: AsyncValue[WorkerIds],
     sub_veh_broadcast_deltas: str,
     sub_veh_listen: str,
     sub_veh_cmd: str,
     sub_veh_status: str,
+    vnodes: int,
+    load_factor: float,
+    status_interval: float,
+    status_slots: int,
 ):
-    worker_ids = frozenset[str]()
+    ring = HashRing(())
+    # Bounded-load ownership over the workers and vehicles the coordinator
+    # published, so it is the same on every worker. Vehicles created since then
+    # fall back to their plain position on the ring until the next membership.
+    assignment: dict[str, str] = {}
     known_vehicles: dict[str, VehicleConfig] = {}
 
+    vehicles = TickScheduler[SimulatedVehicle](status_interval, status_slots)
+
     async with asyncio.TaskGroup() as tg:
-        tasks_veh: dict[str, asyncio.Task[None]] = {}
 
         def cancel_veh(vehicle_id: str):
-            if vehicle_id not in tasks_veh:
-                return
-            tasks_veh[vehicle_id].cancel()
-            del tasks_veh[vehicle_id]
+            vehicles.remove(vehicle_id)
+
+        def owner(vehicle_id: str) -> str | None:
+            if vehicle_id in assignment:
+                return assignment[vehicle_id]
+            return ring.owner(vehicle_id)
+
+        def start_veh(vehicle_config: VehicleConfig):
+            try:
+                vehicles.add(
+                    vehicle_config.vehicle_id,
+                    SimulatedVehicle.from_config(vehicle_config),
+                )
+            except ValueError as e:
+                cancel_veh(vehicle_config.vehicle_id)
+                logger.warning(
+                    "Can't run vehicle %s.", vehicle_config.vehicle_id, exc_info=e
+                )
 
         def add_veh(vehicle_config: VehicleConfig):
+            previous = known_vehicles.get(vehicle_config.vehicle_id)
             known_vehicles[vehicle_config.vehicle_id] = vehicle_config
-            if not _belongs_to_worker(worker_id, worker_ids, vehicle_config.vehicle_id):
+            if owner(vehicle_config.vehicle_id) != worker_id:
                 return
-            cancel_veh(vehicle_config.vehicle_id)
-            tasks_veh[vehicle_config.vehicle_id] = tg.create_task(
-                run_background_task(
-                    lambda vc=vehicle_config: run_vehicle_controller(
-                        nc,
-                        vc,
-                        f"{sub_veh_cmd}.{vehicle_config.vehicle_id}",
-                        f"{sub_veh_status}.{vehicle_config.vehicle_id}",
-                    ),
-                    f"vehicle-{vehicle_config.vehicle_id}",
-                )
-            )
+            # A running vehicle is only restarted if its configuration changed.
+            if vehicle_config.vehicle_id in vehicles and previous == vehicle_config:
+                return
+            start_veh(vehicle_config)
 
         def remove_veh(vehicle_id: str):
             if vehicle_id in known_vehicles:
@@ -108,22 +93,49 @@ async def run_workers(
                     for vid in delta.vehicle_ids:
                         remove_veh(vid)
 
+        def rebalance():
+            diff = ownership_diff(
+                vehicles,
+                (vid for vid in known_vehicles if owner(vid) == worker_id),
+            )
+            for vid in diff.lost:
+                cancel_veh(vid)
+            for vid in diff.gained:
+                start_veh(known_vehicles[vid])
+            logger.info(
+                "Rebalanced vehicles: %d started, %d stopped, %d kept running.",
+                len(diff.gained),
+                len(diff.lost),
+                len(diff.unchanged),
+            )
+
         async def rebalance_loop():
-            nonlocal worker_ids
+            nonlocal ring, assignment
 
             while True:
-                other_worker_ids, wait_for_worker_ids = q_worker_ids.get()
-                worker_ids = frozenset(other_worker_ids) | {worker_id}
-
-                for vid in tasks_veh:
-                    if not _belongs_to_worker(worker_id, worker_ids, vid):
-                        cancel_veh(vid)
-                for veh in known_vehicles.values():
-                    add_veh(veh)
-
+                membership, wait_for_worker_ids = q_worker_ids.get()
+                # A worker the coordinator hasn't seen yet runs nothing, just as
+                # the others expect.
+                ring = HashRing(membership.worker_ids, vnodes)
+                assignment = ring.assign(membership.vehicle_ids, load_factor)
+                logger.info(
+                    "Assigned %d vehicles to %d workers, max/mean load %.2f.",
+                    len(assignment),
+                    len(ring.nodes),
+                    max_mean_load(assignment, ring.nodes),
+                )
+                rebalance()
                 await wait_for_worker_ids()
 
         task_rebalance = tg.create_task(rebalance_loop())  # noqa: F841
+        task_vehicles = tg.create_task(  # noqa: F841
+            run_background_task(
+                lambda: run_vehicle_controllers(
+                    nc, vehicles, sub_veh_cmd, sub_veh_status
+                ),
+                "vehicles",
+            )
+        )
 
         async with with_cleanup_sub(
             await nc.subscribe(sub_veh_broadcast_deltas, cb=on_delta)
@@ -132,5 +144,6 @@ async def run_workers(
                 (await nc.request(sub_veh_listen, b"")).data
             )
             for veh in delta.vehicles:
-                add_veh(veh)
+                known_vehicles[veh.vehicle_id] = veh
+            rebalance()
             await asyncio.Future()
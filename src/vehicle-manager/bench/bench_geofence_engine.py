@@ -0,0 +1,95 @@
+"""Compares GeofenceEngine against testing every assigned geofence point by point.
+
+Run with `uv run python bench/bench_geofence_engine.py`.
+"""
+
+import random
+from collections.abc import Callable
+from time import perf_counter
+from uuid import UUID, uuid4
+
+import numpy as np
+from shapely.geometry import Point, mapping
+
+from vehicle_manager.geofence_cache import (
+    CompiledGeofence,
+    GeofenceIndex,
+    compile_geofence,
+)
+from vehicle_manager.geofence_engine import GeofenceEngine
+
+
+def make_geofences(n: int) -> list[CompiledGeofence]:
+    ret = []
+    for i in range(n):
+        center = Point(random.uniform(14.0, 15.0), random.uniform(45.8, 46.3))
+        data = mapping(center.buffer(random.uniform(0.01, 0.05), quad_segs=64))
+        gf = compile_geofence(uuid4(), i, data, True, True)
+        assert gf is not None
+        ret.append(gf)
+    return ret
+
+
+def per_point_loop(
+    vehicle_ids: list[UUID],
+    prev: np.ndarray,
+    curr: np.ndarray,
+    assignments: dict[UUID, list[CompiledGeofence]],
+) -> list[tuple[int, UUID, bool]]:
+    ret = []
+    for row, vehicle_id in enumerate(vehicle_ids):
+        curr_point = Point(*curr[row])
+        prev_point = Point(*prev[row])
+        for gf in assignments[vehicle_id]:
+            curr_inside = gf.geometry.contains(curr_point)
+            prev_inside = gf.geometry.contains(prev_point)
+            if curr_inside != prev_inside:
+                ret.append((row, gf.id, curr_inside))
+    return ret
+
+
+def best_of[T](fn: Callable[[], T], repeat: int = 5) -> tuple[T, float]:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        ret = fn()
+        times.append(perf_counter() - start)
+    return ret, min(times)
+
+
+def run(n_vehicles: int, n_geofences: int, per_vehicle: int, n_rows: int):
+    geofences = make_geofences(n_geofences)
+    vehicles = [uuid4() for _ in range(n_vehicles)]
+    assignments = {vid: random.sample(geofences, per_vehicle) for vid in vehicles}
+
+    vehicle_ids = [random.choice(vehicles) for _ in range(n_rows)]
+    prev = np.column_stack(
+        [np.random.uniform(14.0, 15.0, n_rows), np.random.uniform(45.8, 46.3, n_rows)]
+    )
+    curr = prev + np.random.normal(0, 0.01, prev.shape)
+
+    assigned_ids = {vid: {gf.id for gf in gfs} for vid, gfs in assignments.items()}
+
+    expected, t_loop = best_of(
+        lambda: per_point_loop(vehicle_ids, prev, curr, assignments)
+    )
+    got, t_engine = best_of(
+        lambda: GeofenceEngine(GeofenceIndex(geofences)).evaluate(
+            vehicle_ids, prev, curr, assigned_ids
+        )
+    )
+
+    assert sorted(expected) == sorted((t.row, t.geofence.id, t.entered) for t in got)
+    print(
+        f"{n_rows:>6} rows, {n_geofences:>4} geofences, {per_vehicle:>3} per vehicle: "
+        f"loop {t_loop * 1000:8.1f} ms, engine {t_engine * 1000:7.1f} ms "
+        f"({t_loop / t_engine:5.1f}x), {len(got)} transitions"
+    )
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    np.random.seed(0)
+    for n_geofences, per_vehicle in [(10, 3), (100, 20), (500, 200)]:
+        for n_rows in [100, 1000, 10000]:
+            run(1000, n_geofences, per_vehicle, n_rows)
@@ -0,0 +1,97 @@
+"""partition vehicle_pos and vehicle_geofence_event by ts
+
+Revision ID: c7d2e9f0a1b3
+Revises: b3e1c2d4a5f6
+Create Date: 2026-10-17 11:03:27.551804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e9f0a1b3'
+down_revision: Union[str, Sequence[str], None] = 'b3e1c2d4a5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions cover one UTC day. The application creates upcoming partitions at
+# runtime, this only has to cover the existing rows and the next few days.
+PREMAKE_DAYS = 7
+
+TABLES = {
+    'vehicle_pos': (
+        """
+        lat double precision NOT NULL,
+        lon double precision NOT NULL,
+        vehicle_id uuid NOT NULL REFERENCES vehicle (id),
+        ts timestamp with time zone NOT NULL,
+        PRIMARY KEY (vehicle_id, ts)
+        """,
+        'lat, lon, vehicle_id, ts',
+    ),
+    'vehicle_geofence_event': (
+        """
+        geofence_id uuid NOT NULL REFERENCES geofence (id),
+        entered boolean NOT NULL,
+        vehicle_id uuid NOT NULL REFERENCES vehicle (id),
+        ts timestamp with time zone NOT NULL,
+        PRIMARY KEY (geofence_id, vehicle_id, ts)
+        """,
+        'geofence_id, entered, vehicle_id, ts',
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, (columns, column_names) in TABLES.items():
+        op.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+        op.execute(f'ALTER INDEX {table}_pkey RENAME TO {table}_old_pkey')
+        op.execute(f'CREATE TABLE {table} ({columns}) PARTITION BY RANGE (ts)')
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+        op.execute(f"""
+            DO $$
+            DECLARE
+                day date;
+            BEGIN
+                FOR day IN
+                    SELECT generate_series(
+                        date_trunc(
+                            'day',
+                            LEAST((SELECT min(ts) FROM {table}_old), now())
+                            AT TIME ZONE 'UTC'
+                        ),
+                        now() AT TIME ZONE 'UTC' + interval '{PREMAKE_DAYS} days',
+                        interval '1 day'
+                    )::date
+                LOOP
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF {table} '
+                        'FOR VALUES FROM (%L) TO (%L)',
+                        '{table}_p' || to_char(day, 'YYYYMMDD'),
+                        day::timestamp AT TIME ZONE 'UTC',
+                        (day + 1)::timestamp AT TIME ZONE 'UTC'
+                    );
+                END LOOP;
+            END
+            $$
+        """)
+        op.execute(
+            f'INSERT INTO {table} ({column_names}) '
+            f'SELECT {column_names} FROM {table}_old'
+        )
+        op.execute(f'DROP TABLE {table}_old')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, (columns, column_names) in TABLES.items():
+        op.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+        op.execute(f'ALTER INDEX {table}_pkey RENAME TO {table}_old_pkey')
+        op.execute(f'CREATE TABLE {table} ({columns})')
+        op.execute(
+            f'INSERT INTO {table} ({column_names}) '
+            f'SELECT {column_names} FROM {table}_old'
+        )
+        op.execute(f'DROP TABLE {table}_old')
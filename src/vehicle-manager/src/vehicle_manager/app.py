@@ -1,5 +1,6 @@
 import asyncio
 from contextlib import asynccontextmanager, chdir
+from functools import partial
 from pathlib import Path
 
 from alembic import command
@@ -7,13 +8,30 @@ from alembic.config import Config
 from fastapi import FastAPI, Request
 from fastapi_problem.handler import add_exception_handler
 
-from vehicle_manager import crud, health
-from vehicle_manager.controller_link import run_telemetry_listener, run_veh_listener
+from vehicle_manager import crud, health, live
+from vehicle_manager.command_outbox import CommandOutbox
+from vehicle_manager.controller_link import (
+    run_cache_sync,
+    run_live_feed,
+    run_telemetry_listener,
+    run_veh_delta_publisher,
+    run_veh_listener,
+    transmit_immobilize,
+)
 from vehicle_manager.db.core import DatabaseSessionManager
+from vehicle_manager.delta_outbox import DeltaOutbox
 from vehicle_manager.errors import eh
+from vehicle_manager.geofence_cache import GeofenceCache
+from vehicle_manager.live import LiveHub
+from vehicle_manager.metrics import Metrics
+from vehicle_manager.metrics import router as metrics_router
 from vehicle_manager.nats import NATS
+from vehicle_manager.partitions import run_partition_manager
 from vehicle_manager.resilience import run_background_task
+from vehicle_manager.retention import run_retention_job
 from vehicle_manager.settings import Settings
+from vehicle_manager.state_cache import StateCache
+from vehicle_manager.trajectory import TrajectoryCache
 
 
 def run_migrations(database_url: str):
@@ -54,23 +72,86 @@ async def with_nats(nats_url):
 
 
 @asynccontextmanager
-async def with_listeners(dsm: DatabaseSessionManager, nc: NATS, settings: Settings):
+async def with_listeners(
+    dsm: DatabaseSessionManager,
+    nc: NATS,
+    settings: Settings,
+    state_cache: StateCache,
+    geofence_cache: GeofenceCache,
+    outbox: CommandOutbox,
+    delta_outbox: DeltaOutbox,
+    hub: LiveHub,
+    metrics: Metrics,
+):
     async with asyncio.TaskGroup() as tg:
         task_telemetry = tg.create_task(
             run_background_task(
-                lambda: run_telemetry_listener(dsm, nc, settings),
+                lambda: run_telemetry_listener(
+                    dsm,
+                    nc,
+                    settings,
+                    state_cache,
+                    geofence_cache,
+                    outbox,
+                    hub,
+                    metrics,
+                ),
                 "telemetry_listener",
             )
         )
+        task_cache_sync = tg.create_task(
+            run_background_task(
+                lambda: run_cache_sync(nc, settings, state_cache, geofence_cache),
+                "cache_sync",
+            )
+        )
         task_veh_request = tg.create_task(
             run_background_task(
                 lambda: run_veh_listener(dsm, nc, settings),
                 "veh_request_listener",
             )
         )
+        task_command_sender = tg.create_task(
+            run_background_task(
+                lambda: outbox.run(partial(transmit_immobilize, nc, settings)),
+                "command_sender",
+            )
+        )
+        task_veh_delta_publisher = tg.create_task(
+            run_background_task(
+                lambda: run_veh_delta_publisher(
+                    dsm, nc, settings, delta_outbox, metrics
+                ),
+                "veh_delta_publisher",
+            )
+        )
+        task_partition_manager = tg.create_task(
+            run_background_task(
+                lambda: run_partition_manager(dsm, settings),
+                "partition_manager",
+            )
+        )
+        task_retention = tg.create_task(
+            run_background_task(
+                lambda: run_retention_job(dsm, settings, metrics),
+                "retention_job",
+            )
+        )
+        task_live_feed = tg.create_task(
+            run_background_task(
+                lambda: run_live_feed(nc, settings, hub),
+                "live_feed",
+            )
+        )
         yield
         task_telemetry.cancel()
+        task_cache_sync.cancel()
         task_veh_request.cancel()
+        task_command_sender.cancel()
+        task_veh_delta_publisher.cancel()
+        task_partition_manager.cancel()
+        task_retention.cancel()
+        task_live_feed.cancel()
 
 
 def make_app(*, settings: Settings | None = None) -> FastAPI:
@@ -79,21 +160,56 @@ def make_app(*, settings: Settings | None = None) -> FastAPI:
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
+        state_cache = StateCache(settings.state_cache_ttl)
+        geofence_cache = GeofenceCache(settings.geofence_cache_ttl)
+        trajectory_cache = TrajectoryCache(settings.trajectory_cache_size)
+        outbox = CommandOutbox()
+        delta_outbox = DeltaOutbox()
+        hub = LiveHub(settings.live_max_announced)
+        metrics = Metrics()
+        metrics.gauge("live_clients", lambda: hub.clients)
+        metrics.counter("live_dropped_total", lambda: hub.dropped)
+        metrics.counter("live_announce_dropped_total", lambda: hub.dropped_announced)
+        metrics.gauge("command_outbox_pending", lambda: outbox.pending)
+        metrics.counter("command_outbox_sent_total", lambda: outbox.sent)
+        metrics.counter("command_outbox_failed_total", lambda: outbox.failed)
         async with (
             with_session_manager(settings.database_url) as dsm,
             with_nats(settings.nats_url) as nc,
-            with_listeners(dsm, nc, settings),
+            with_listeners(
+                dsm,
+                nc,
+                settings,
+                state_cache,
+                geofence_cache,
+                outbox,
+                delta_outbox,
+                hub,
+                metrics,
+            ),
         ):
             app.state.settings = settings
             app.state.db_session_manager = dsm
             app.state.nc = nc
+            app.state.state_cache = state_cache
+            app.state.geofence_cache = geofence_cache
+            app.state.trajectory_cache = trajectory_cache
+            app.state.command_outbox = outbox
+            app.state.delta_outbox = delta_outbox
+            app.state.live_hub = hub
+            app.state.metrics = metrics
             add_exception_handler(app, eh)
 
             app.include_router(health.router, prefix="/health")
+            app.include_router(metrics_router, prefix="/metrics")
             app.include_router(
                 crud.router,
                 prefix=f"/api/vehicle_manager/{settings.tenant_id}",
             )
+            app.include_router(
+                live.router,
+                prefix=f"/api/vehicle_manager/{settings.tenant_id}",
+            )
 
             yield
 
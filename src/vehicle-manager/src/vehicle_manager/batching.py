@@ -0,0 +1,100 @@
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+
+@dataclass
+class BufferedItem[K, T]:
+    key: K
+    item: T
+    # Older items this one replaced while the buffer was over capacity.
+    superseded: list[T] = field(default_factory=list)
+
+
+class CoalescingBatcher[K, T]:
+    """Groups items into batches of at most `max_size` items without ever making
+    the producer wait.
+
+    A batch is handed out once it is full or `max_wait` seconds after its first
+    item arrived, whichever comes first. Items keep their arrival order.
+
+    Once `capacity` items are pending, a coalescible item replaces the newest
+    pending item with the same key, provided nothing non-coalescible for that key
+    was queued after it. The replaced item is kept in `superseded` while fewer
+    than `max_superseded` are held, and dropped otherwise. Only items for keys
+    that have nothing pending, or non-coalescible items, grow the buffer past
+    `capacity`.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_wait: float,
+        capacity: int,
+        max_superseded: int,
+    ) -> None:
+        self._items = deque[BufferedItem[K, T]]()
+        self._latest: dict[K, BufferedItem[K, T]] = {}
+        self._added = asyncio.Event()
+        self._max_size = max_size
+        self._max_wait = max_wait
+        self.capacity = capacity
+        self.max_superseded = max_superseded
+        self.superseded = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._items)
+
+    def put(self, key: K, item: T, coalescible: bool) -> None:
+        if not coalescible:
+            self._latest.pop(key, None)
+        elif len(self._items) >= self.capacity and (latest := self._latest.get(key)):
+            if self.superseded < self.max_superseded:
+                latest.superseded.append(latest.item)
+                self.superseded += 1
+            else:
+                self.dropped += 1
+            latest.item = item
+            self.coalesced += 1
+            return
+
+        buffered = BufferedItem(key, item)
+        self._items.append(buffered)
+        if coalescible:
+            self._latest[key] = buffered
+        self._added.set()
+
+    async def _wait_for_items(self, deadline: float | None = None) -> None:
+        self._added.clear()
+        async with asyncio.timeout_at(deadline):
+            await self._added.wait()
+
+    async def next_batch(self) -> list[BufferedItem[K, T]]:
+        while not self._items:
+            await self._wait_for_items()
+
+        deadline = asyncio.get_running_loop().time() + self._max_wait
+        try:
+            while len(self._items) < self._max_size:
+                await self._wait_for_items(deadline)
+        except TimeoutError:
+            pass
+
+        batch: list[BufferedItem[K, T]] = []
+        while self._items and len(batch) < self._max_size:
+            buffered = self._items.popleft()
+            if self._latest.get(buffered.key) is buffered:
+                del self._latest[buffered.key]
+            self.superseded -= len(buffered.superseded)
+            batch.append(buffered)
+        return batch
+
+    async def run(
+        self, on_batch: Callable[[list[BufferedItem[K, T]]], Awaitable[None]]
+    ):
+        while True:
+            await on_batch(await self.next_batch())
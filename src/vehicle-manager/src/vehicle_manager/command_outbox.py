@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import Depends, FastAPI, Request
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ImmobilizeCommand:
+    vehicle_id: UUID
+    active: bool
+    user_id: str | None
+    geofence_id: UUID | None
+
+
+class CommandOutbox:
+    """Immobilizer commands waiting to be sent, in the order they were enqueued.
+
+    Only the newest desired state of a vehicle is kept, so repeating a command
+    that is still pending is free and a command that was overridden before it
+    went out is never sent.
+    """
+
+    def __init__(self, min_backoff: float = 0.5, max_backoff: float = 30.0) -> None:
+        self._pending: dict[UUID, ImmobilizeCommand] = {}
+        self._added = asyncio.Event()
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def enqueue(self, cmd: ImmobilizeCommand) -> None:
+        # Re-inserting moves the vehicle to the back of the queue.
+        self._pending.pop(cmd.vehicle_id, None)
+        self._pending[cmd.vehicle_id] = cmd
+        self._added.set()
+
+    async def run(self, send: Callable[[ImmobilizeCommand], Awaitable[None]]):
+        backoff = self._min_backoff
+        while True:
+            while not self._pending:
+                self._added.clear()
+                await self._added.wait()
+
+            cmd = next(iter(self._pending.values()))
+            try:
+                await send(cmd)
+            except Exception as e:
+                self.failed += 1
+                logger.warning(
+                    "Sending command %r failed, retrying in %.1fs.",
+                    cmd,
+                    backoff,
+                    exc_info=e,
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self._max_backoff)
+                continue
+
+            backoff = self._min_backoff
+            self.sent += 1
+            if self._pending.get(cmd.vehicle_id) is cmd:
+                del self._pending[cmd.vehicle_id]
+
+
+async def get_command_outbox_from_fastapi(app: FastAPI) -> CommandOutbox:
+    outbox: CommandOutbox = app.state.command_outbox
+    return outbox
+
+
+async def get_command_outbox(request: Request) -> CommandOutbox:
+    return await get_command_outbox_from_fastapi(request.app)
+
+
+GetCommandOutbox = Annotated[CommandOutbox, Depends(get_command_outbox)]
@@ -1,25 +1,39 @@
 import asyncio
+from collections import defaultdict
+from collections.abc import Sequence
+from dataclasses import dataclass
 from datetime import datetime
+from functools import partial
+from itertools import chain
+from math import nan
 from typing import Any, Literal
 from uuid import UUID
 
+import numpy as np
 from pydantic import BaseModel, TypeAdapter
-from shapely.geometry import Point, shape
-from sqlalchemy import and_, select
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from vehicle_manager.db.core import DatabaseSessionManager
+from vehicle_manager.batching import BufferedItem, CoalescingBatcher
+from vehicle_manager.command_outbox import CommandOutbox, ImmobilizeCommand
+from vehicle_manager.db.core import DatabaseSessionManager, on_commit
 from vehicle_manager.db.models import (
-    Geofence,
     Vehicle,
-    VehicleGeofence,
+    VehicleDeltaOutbox,
     VehicleGeofenceEvent,
     VehicleImmobilized,
     VehiclePos,
 )
+from vehicle_manager.delta_outbox import DeltaOutbox
+from vehicle_manager.geofence_cache import GeofenceCache
+from vehicle_manager.geofence_engine import GeofenceEngine, Transition
+from vehicle_manager.live import LiveGeofence, LiveHub, LiveImmobilizer, LivePos
+from vehicle_manager.metrics import Metrics
 from vehicle_manager.nats import NATS, Msg, with_cleanup_sub
 from vehicle_manager.resilience import with_retries
 from vehicle_manager.settings import Settings
+from vehicle_manager.state_cache import StateCache
 
 
 class VehicleCmdImmobilizerCorrelation(BaseModel):
@@ -47,152 +61,403 @@ class VehicleStatusImmobilizer(BaseModel):
     ts: datetime
 
 
-@with_retries(60, 5.0)
-async def transmit_immobilize(
-    nc: NATS,
-    settings: Settings,
-    vehicle_id: UUID,
-    user_id: str | None,
-    geofence_id: UUID | None,
-    active: bool,
-):
+VehicleStatus = VehicleStatusPos | VehicleStatusImmobilizer
+VehicleStatusAdapter = TypeAdapter[VehicleStatus](VehicleStatus)
+
+
+async def transmit_immobilize(nc: NATS, settings: Settings, cmd: ImmobilizeCommand):
     await nc.publish(
-        f"{settings.sub_veh_cmd}.{vehicle_id}",
+        f"{settings.sub_veh_cmd}.{cmd.vehicle_id}",
         VehicleCmdImmobilizer(
             correlation=VehicleCmdImmobilizerCorrelation(
-                user_id=user_id, geofence_id=geofence_id
+                user_id=cmd.user_id, geofence_id=cmd.geofence_id
             ),
-            active=active,
+            active=cmd.active,
         )
         .model_dump_json()
         .encode("utf-8"),
     )
 
 
-async def process_pos_telemetry(
+@dataclass
+class _TelemetryVehicleState:
+    immobilized: bool
+    lat: float | None
+    lon: float | None
+    moved: bool = False
+    immobilizer_changed: bool = False
+
+
+async def process_telemetry_batch(
     db: AsyncSession,
-    nc: NATS,
-    settings: Settings,
-    vehicle_id: UUID,
-    lat: float,
-    lon: float,
-    ts: datetime,
-) -> None:
-    vehicle = await db.get(Vehicle, vehicle_id)
-    if not vehicle or not vehicle.active:
-        return
-
-    prev_pos = (
-        (vehicle.lon, vehicle.lat)
-        if vehicle.lon is not None and vehicle.lat is not None
-        else None
+    cache: StateCache,
+    geofence_cache: GeofenceCache,
+    outbox: CommandOutbox,
+    hub: LiveHub,
+    batch: Sequence[tuple[UUID, VehicleStatus]],
+    history_only: Sequence[tuple[UUID, VehicleStatusPos]] = (),
+) -> int:
+    """Writes a batch of telemetry and acts on the geofence transitions it causes.
+
+    Positions in `history_only` are only added to the position history. They are
+    older than the batch's own positions for the same vehicle.
+
+    Messages that were already stored, e.g. because NATS redelivered them, are
+    skipped. Returns how many there were.
+    """
+    cached = await cache.get_vehicles(db, {vehicle_id for vehicle_id, _ in batch})
+    if not cached:
+        return 0
+    # Telemetry of one vehicle is spread over all replicas, so its last position
+    # and immobilizer state are read from the database. The rows stay locked until
+    # commit, so a concurrent batch on another replica continues from this one's
+    # result. Locking in id order keeps two batches from deadlocking.
+    stmt = (
+        select(Vehicle.id, Vehicle.immobilized, Vehicle.lat, Vehicle.lon)
+        .where(Vehicle.id.in_(list(cached)))
+        .order_by(Vehicle.id)
+        .with_for_update()
+    )
+    vehicles = {
+        row.id: _TelemetryVehicleState(row.immobilized, row.lat, row.lon)
+        for row in await db.execute(stmt)
+    }
+    if not vehicles:
+        return 0
+
+    # A superseded position can be the same message as one the batch kept, e.g.
+    # when NATS redelivers it while it is being coalesced. It is stored once, as
+    # the batch's own.
+    retained = {
+        (status.ts, vehicle_id)
+        for vehicle_id, status in batch
+        if isinstance(status, VehicleStatusPos)
+    }
+    history = [
+        (vehicle_id, status)
+        for vehicle_id, status in history_only
+        if (status.ts, vehicle_id) not in retained
+    ]
+
+    positions = [
+        {
+            "ts": status.ts,
+            "vehicle_id": vehicle_id,
+            "lat": status.lat,
+            "lon": status.lon,
+        }
+        for vehicle_id, status in chain(history, batch)
+        if vehicle_id in vehicles and isinstance(status, VehicleStatusPos)
+    ]
+    immobilized_events = [
+        {
+            "ts": status.ts,
+            "vehicle_id": vehicle_id,
+            "user_id": status.correlation.user_id,
+            "geofence_id": status.correlation.geofence_id,
+            "immobilized": status.active,
+        }
+        for vehicle_id, status in batch
+        if vehicle_id in vehicles and isinstance(status, VehicleStatusImmobilizer)
+    ]
+
+    # Both tables are keyed by (ts, vehicle_id), so a message that is already
+    # stored conflicts and is left out of RETURNING. Only the messages that were
+    # actually inserted go on to change any state.
+    new_positions = await _insert_new(db, VehiclePos, positions)
+    new_immobilized = await _insert_new(db, VehicleImmobilized, immobilized_events)
+    duplicates = (
+        len(history_only)
+        - len(history)
+        + len(positions)
+        + len(immobilized_events)
+        - len(new_positions)
+        - len(new_immobilized)
     )
 
-    vehicle.lat = lat
-    vehicle.lon = lon
-    new_pos = VehiclePos(ts=ts, vehicle_id=vehicle_id, lat=lat, lon=lon)
-    db.add(new_pos)
-
-    geofences_stmt = (
-        select(Geofence)
-        .join(VehicleGeofence, VehicleGeofence.geofence_id == Geofence.id)
-        .where(
-            and_(VehicleGeofence.vehicle_id == vehicle_id, Geofence.active.is_(True))
+    fresh: list[tuple[UUID, VehicleStatus]] = []
+    for vehicle_id, status in batch:
+        if vehicle_id not in vehicles:
+            continue
+        inserted = (
+            new_positions if isinstance(status, VehicleStatusPos) else new_immobilized
+        )
+        key = (status.ts, vehicle_id)
+        if key in inserted:
+            # The same message twice in one batch is only inserted once.
+            inserted.remove(key)
+            fresh.append((vehicle_id, status))
+
+    geofence_events: list[dict[str, Any]] = []
+    commands: list[ImmobilizeCommand] = []
+
+    # Every position is a row going from the vehicle's previous position to the
+    # new one, so all geofence tests for the batch can run in one go.
+    last_pos = {
+        vehicle_id: (
+            (vehicle.lon, vehicle.lat)
+            if vehicle.lon is not None and vehicle.lat is not None
+            else (nan, nan)
         )
+        for vehicle_id, vehicle in vehicles.items()
+    }
+    rows: list[UUID] = []
+    prev: list[tuple[float, float]] = []
+    curr: list[tuple[float, float]] = []
+    for vehicle_id, status in fresh:
+        if isinstance(status, VehicleStatusPos):
+            rows.append(vehicle_id)
+            prev.append(last_pos[vehicle_id])
+            curr.append((status.lon, status.lat))
+            last_pos[vehicle_id] = (status.lon, status.lat)
+
+    geofences = await geofence_cache.get_many(
+        db, {gid for state in cached.values() for gid in state.geofence_ids}
     )
-    geofences = (await db.scalars(geofences_stmt)).all()
+    transitions: dict[int, list[Transition]] = defaultdict(list)
+    if rows and geofences:
+        engine = GeofenceEngine(geofence_cache.index(geofences))
+        for t in engine.evaluate(
+            rows,
+            np.array(prev),
+            np.array(curr),
+            {vehicle_id: state.geofence_ids for vehicle_id, state in cached.items()},
+        ):
+            transitions[t.row].append(t)
+
+    # Messages are handled in arrival order, so every vehicle sees its own
+    # positions and immobilizer updates in the order they were sent.
+    row = 0
+    for vehicle_id, status in fresh:
+        vehicle = vehicles[vehicle_id]
 
-    if not geofences:
-        return
+        match status:
+            case VehicleStatusPos(lat=lat, lon=lon, ts=ts):
+                vehicle.lat = lat
+                vehicle.lon = lon
+                vehicle.moved = True
+
+                for t in transitions[row]:
+                    gf = t.geofence
+                    geofence_events.append(
+                        {
+                            "ts": ts,
+                            "vehicle_id": vehicle_id,
+                            "geofence_id": gf.id,
+                            "entered": t.entered,
+                        }
+                    )
+                    if t.entered and gf.immobilize_enter and not vehicle.immobilized:
+                        commands.append(
+                            ImmobilizeCommand(vehicle_id, True, None, gf.id)
+                        )
+                    if not t.entered and gf.immobilize_leave and vehicle.immobilized:
+                        commands.append(
+                            ImmobilizeCommand(vehicle_id, False, None, gf.id)
+                        )
+                row += 1
+            case VehicleStatusImmobilizer(active=active):
+                vehicle.immobilized = active
+                vehicle.immobilizer_changed = True
+
+    if geofence_events:
+        await db.execute(
+            pg_insert(VehicleGeofenceEvent).on_conflict_do_nothing(), geofence_events
+        )
 
-    current_point = Point(lon, lat)
-    prev_point = Point(*prev_pos) if prev_pos is not None else None
+    moved = [
+        {"id": vehicle_id, "lat": vehicle.lat, "lon": vehicle.lon}
+        for vehicle_id, vehicle in vehicles.items()
+        if vehicle.moved
+    ]
+    if moved:
+        await db.execute(update(Vehicle), moved)
+    immobilizer_changed = [
+        {"id": vehicle_id, "immobilized": vehicle.immobilized}
+        for vehicle_id, vehicle in vehicles.items()
+        if vehicle.immobilizer_changed
+    ]
+    if immobilizer_changed:
+        await db.execute(update(Vehicle), immobilizer_changed)
+
+    def after_commit():
+        for cmd in commands:
+            outbox.enqueue(cmd)
+        for event in geofence_events:
+            hub.announce(LiveGeofence(**event))
+
+    on_commit(db, after_commit)
+    return duplicates
+
+
+async def _insert_new(
+    db: AsyncSession,
+    model: type[VehiclePos] | type[VehicleImmobilized],
+    values: list[dict[str, Any]],
+) -> set[tuple[datetime, UUID]]:
+    """Inserts `values`, skipping rows that already exist, and returns the
+    `(ts, vehicle_id)` keys of the rows that were inserted."""
+    if not values:
+        return set()
+    stmt = (
+        pg_insert(model).on_conflict_do_nothing().returning(model.ts, model.vehicle_id)
+    )
+    result = await db.execute(stmt, values)
+    return {(ts, vehicle_id) for ts, vehicle_id in result.tuples()}
 
-    for gf in geofences:
-        try:
-            polygon = shape(gf.data)
-        except Exception:
-            continue
 
-        curr_inside = polygon.contains(current_point)
-        prev_inside = polygon.contains(prev_point) if prev_point else False
+async def run_telemetry_listener(
+    db_session_manager: DatabaseSessionManager,
+    nc: NATS,
+    settings: Settings,
+    cache: StateCache,
+    geofence_cache: GeofenceCache,
+    outbox: CommandOutbox,
+    hub: LiveHub,
+    metrics: Metrics,
+):
+    shards = [
+        CoalescingBatcher[UUID, VehicleStatus](
+            settings.telemetry_batch_size,
+            settings.telemetry_batch_window,
+            settings.telemetry_shard_queue_size,
+            settings.telemetry_overload_max_persisted
+            if settings.telemetry_overload_policy == "persist"
+            else 0,
+        )
+        for _ in range(settings.telemetry_shards)
+    ]
+    metrics.gauge("telemetry_shards", lambda: len(shards))
+    for i, shard in enumerate(shards):
+        labels = {"shard": str(i)}
+        metrics.gauge(
+            "telemetry_shard_queue_depth", lambda s=shard: s.pending, **labels
+        )
+        metrics.gauge(
+            "telemetry_shard_queue_capacity", lambda s=shard: s.capacity, **labels
+        )
+        metrics.gauge(
+            "telemetry_shard_superseded", lambda s=shard: s.superseded, **labels
+        )
+        metrics.counter(
+            "telemetry_coalesced_total", lambda s=shard: s.coalesced, **labels
+        )
+        metrics.counter("telemetry_dropped_total", lambda s=shard: s.dropped, **labels)
 
-        if curr_inside != prev_inside:
-            db.add(
-                VehicleGeofenceEvent(
-                    ts=ts,
-                    vehicle_id=vehicle_id,
-                    geofence_id=gf.id,
-                    entered=curr_inside,
-                )
+    @with_retries(60, 5.0)
+    async def on_batch(shard: int, batch: list[BufferedItem[UUID, VehicleStatus]]):
+        history_only = [
+            (buffered.key, status)
+            for buffered in batch
+            for status in buffered.superseded
+            if isinstance(status, VehicleStatusPos)
+        ]
+        async with db_session_manager.session() as db:
+            duplicates = await process_telemetry_batch(
+                db,
+                cache,
+                geofence_cache,
+                outbox,
+                hub,
+                [(buffered.key, buffered.item) for buffered in batch],
+                history_only,
             )
-            if curr_inside and gf.immobilize_enter and not vehicle.immobilized:
-                await transmit_immobilize(nc, settings, vehicle_id, None, gf.id, True)
-            if not curr_inside and gf.immobilize_leave and vehicle.immobilized:
-                await transmit_immobilize(nc, settings, vehicle_id, None, gf.id, False)
+        metrics.inc("telemetry_messages_total", len(batch), shard=str(shard))
+        metrics.inc("telemetry_batches_total", shard=str(shard))
+        metrics.inc("telemetry_duplicates_total", duplicates, shard=str(shard))
 
+    async def on_msg(msg: Msg):
+        vehicle_id = UUID(msg.subject.split(".")[-1])
+        status = VehicleStatusAdapter.validate_json(msg.data)
+        # This never waits, so an overloaded shard coalesces positions instead of
+        # letting messages pile up inside the NATS client.
+        shards[vehicle_id.int % len(shards)].put(
+            vehicle_id, status, isinstance(status, VehicleStatusPos)
+        )
 
-async def process_immobilizer_telemetry(
-    db: AsyncSession,
-    vehicle_id: UUID,
-    correlation: VehicleCmdImmobilizerCorrelation,
-    active: bool,
-    ts: datetime,
-):
-    vehicle = await db.get(Vehicle, vehicle_id)
-    if not vehicle or not vehicle.active:
-        return
+    async with (
+        with_cleanup_sub(
+            await nc.subscribe(f"{settings.sub_veh_status}.*", "vm", cb=on_msg)
+        ),
+        asyncio.TaskGroup() as tg,
+    ):
+        for i, shard in enumerate(shards):
+            tg.create_task(shard.run(partial(on_batch, i)))
 
-    obj = VehicleImmobilized(
-        ts, vehicle_id, correlation.user_id, correlation.geofence_id, active
-    )
-    db.add(obj)
 
-    vehicle.immobilized = active
+async def run_live_feed(nc: NATS, settings: Settings, hub: LiveHub):
+    # Unlike the telemetry listener these aren't queue subscriptions, every
+    # replica needs all updates for its own clients.
+    async def on_status(msg: Msg):
+        vehicle_id = UUID(msg.subject.split(".")[-1])
+        match VehicleStatusAdapter.validate_json(msg.data):
+            case VehicleStatusPos(lat=lat, lon=lon, ts=ts):
+                hub.publish(LivePos(vehicle_id=vehicle_id, ts=ts, lat=lat, lon=lon))
+            case VehicleStatusImmobilizer(active=active, ts=ts):
+                hub.publish(
+                    LiveImmobilizer(vehicle_id=vehicle_id, ts=ts, immobilized=active)
+                )
 
+    async def on_geofence(msg: Msg):
+        hub.publish(LiveGeofence.model_validate_json(msg.data))
 
-VehicleStatus = VehicleStatusPos | VehicleStatusImmobilizer
-VehicleStatusAdapter = TypeAdapter[VehicleStatus](VehicleStatus)
+    async with (
+        with_cleanup_sub(
+            await nc.subscribe(f"{settings.sub_veh_status}.*", cb=on_status)
+        ),
+        with_cleanup_sub(
+            await nc.subscribe(f"{settings.sub_veh_geofence}.*", cb=on_geofence)
+        ),
+    ):
+        while True:
+            for update in await hub.next_announced():
+                await nc.publish(
+                    f"{settings.sub_veh_geofence}.{update.vehicle_id}",
+                    update.model_dump_json().encode("utf-8"),
+                )
 
 
-async def run_telemetry_listener(
-    db_session_manager: DatabaseSessionManager,
+class CacheInvalidation(BaseModel):
+    vehicle_ids: list[UUID] = []
+    geofence_ids: list[UUID] = []
+
+
+async def run_cache_sync(
     nc: NATS,
     settings: Settings,
+    cache: StateCache,
+    geofence_cache: GeofenceCache,
 ):
-    @with_retries(60, 5.0)
-    async def on_status(vehicle_id: UUID, status: VehicleStatus):
-        match status:
-            case VehicleStatusPos():
-                async with db_session_manager.session() as db:
-                    await process_pos_telemetry(
-                        db,
-                        nc,
-                        settings,
-                        vehicle_id,
-                        status.lat,
-                        status.lon,
-                        status.ts,
-                    )
-            case VehicleStatusImmobilizer():
-                async with db_session_manager.session() as db:
-                    await process_immobilizer_telemetry(
-                        db,
-                        vehicle_id,
-                        status.correlation,
-                        status.active,
-                        status.ts,
-                    )
+    # Not a queue subscription, every replica has to drop its own entries. The
+    # replica that announced an invalidation receives it too, which is harmless.
+    async def on_invalidation(msg: Msg):
+        invalidation = CacheInvalidation.model_validate_json(msg.data)
+        cache.drop_vehicles(invalidation.vehicle_ids)
+        geofence_cache.drop(invalidation.geofence_ids)
+
+    async def send(invalidation: CacheInvalidation):
+        await nc.publish(
+            settings.sub_cache_invalidate,
+            invalidation.model_dump_json().encode("utf-8"),
+        )
 
-    async def on_msg(msg: Msg):
-        vehicle_id = UUID(msg.subject.split(".")[-1])
-        status = VehicleStatusAdapter.validate_json(msg.data)
-        await on_status(vehicle_id, status)
+    async def send_vehicles():
+        while True:
+            await send(CacheInvalidation(vehicle_ids=await cache.next_announced()))
 
-    async with with_cleanup_sub(
-        await nc.subscribe(f"{settings.sub_veh_status}.*", "vm", cb=on_msg)
+    async def send_geofences():
+        while True:
+            geofence_ids = await geofence_cache.next_announced()
+            await send(CacheInvalidation(geofence_ids=geofence_ids))
+
+    async with (
+        with_cleanup_sub(
+            await nc.subscribe(settings.sub_cache_invalidate, cb=on_invalidation)
+        ),
+        asyncio.TaskGroup() as tg,
     ):
-        await asyncio.Future()
+        tg.create_task(send_vehicles())
+        tg.create_task(send_geofences())
 
 
 class VehicleConfig(BaseModel):
@@ -235,20 +500,63 @@ async def run_veh_listener(
         await asyncio.Future()
 
 
-@with_retries(10, 5.0)
-async def send_veh_delta(nc: NATS, settings: Settings, vehicle: Vehicle):
-    if not vehicle.active:
-        resp = ResponseDelete(vehicle_ids=[str(vehicle.id)])
-    else:
-        resp = ResponseUpdate(
-            vehicles=[
-                VehicleConfig(
-                    vehicle_id=str(vehicle.id),
-                    vtype=vehicle.vtype,
-                    vdata=vehicle.vconfig,
+async def run_veh_delta_publisher(
+    db_session_manager: DatabaseSessionManager,
+    nc: NATS,
+    settings: Settings,
+    outbox: DeltaOutbox,
+    metrics: Metrics,
+):
+    while True:
+        async with db_session_manager.session() as db:
+            # Only one replica publishes at a time. Two of them draining different
+            # rows of the same vehicle could otherwise publish an update read
+            # before the vehicle was deleted after the delete itself. The lock is
+            # held until commit, which is after the messages were flushed.
+            locked = await db.scalar(
+                text("SELECT pg_try_advisory_xact_lock(hashtext('veh_deltas'))")
+            )
+            stmt = (
+                select(VehicleDeltaOutbox)
+                .order_by(VehicleDeltaOutbox.id)
+                .limit(settings.veh_delta_batch_size)
+            )
+            rows = list(await db.scalars(stmt)) if locked else []
+            if rows:
+                # Announce the vehicles as they are now rather than as they were
+                # when the row was written, so several changes collapse into one.
+                vehicle_ids = {row.vehicle_id for row in rows}
+                stmt = select(Vehicle).where(Vehicle.id.in_(vehicle_ids))
+                vehicles = list(await db.scalars(stmt))
+                updated = [
+                    VehicleConfig(
+                        vehicle_id=str(vehicle.id),
+                        vtype=vehicle.vtype,
+                        vdata=vehicle.vconfig,
+                    )
+                    for vehicle in vehicles
+                    if vehicle.active
+                ]
+                deleted = [
+                    str(vehicle.id) for vehicle in vehicles if not vehicle.active
+                ]
+
+                subject = f"{settings.sub_veh_deltas}.b"
+                if updated:
+                    resp = ResponseUpdate(vehicles=updated)
+                    await nc.publish(subject, resp.model_dump_json().encode("utf-8"))
+                if deleted:
+                    resp = ResponseDelete(vehicle_ids=deleted)
+                    await nc.publish(subject, resp.model_dump_json().encode("utf-8"))
+                # The rows are only removed once NATS has the messages, so a
+                # failure here leaves them for the next attempt.
+                await nc.flush()
+
+                stmt = delete(VehicleDeltaOutbox).where(
+                    VehicleDeltaOutbox.id.in_([row.id for row in rows])
                 )
-            ]
-        )
-    await nc.publish(
-        f"{settings.sub_veh_deltas}.b", resp.model_dump_json().encode("utf-8")
-    )
+                await db.execute(stmt)
+                metrics.inc("veh_deltas_published_total", len(vehicles))
+
+        if len(rows) < settings.veh_delta_batch_size:
+            await outbox.wait(settings.veh_delta_poll_interval)
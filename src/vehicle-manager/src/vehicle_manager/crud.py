@@ -1,16 +1,50 @@
-from datetime import UTC, datetime
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
+from functools import partial
 from typing import Annotated, Any, Literal
-from uuid import UUID
+from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, Query
-from pydantic import BaseModel, Field, field_validator
+import numpy as np
+from fastapi import APIRouter, Body, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 from shapely.geometry import shape
-from sqlalchemy import select
+from sqlalchemy import (
+    ARRAY,
+    Boolean,
+    String,
+    Uuid,
+    any_,
+    bindparam,
+    cast,
+    func,
+    insert,
+    literal,
+    literal_column,
+    null,
+    select,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.types import TypeEngine
 
 from vehicle_manager.auth import AUTH_RESPONSES_DICT, GetUserId, get_user_id
-from vehicle_manager.controller_link import send_veh_delta, transmit_immobilize
-from vehicle_manager.db.core import GetDb
+from vehicle_manager.command_outbox import GetCommandOutbox, ImmobilizeCommand
+from vehicle_manager.db.core import (
+    DatabaseSessionManager,
+    GetDatabaseSessionManager,
+    GetDb,
+    on_commit,
+)
 from vehicle_manager.db.models import (
+    EventWithTs,
     Geofence,
     GeofenceCreated,
     GeofenceDeleted,
@@ -26,9 +60,36 @@ from vehicle_manager.db.models import (
     VehicleModified,
     VehiclePos,
 )
-from vehicle_manager.errors import GeofenceNotFoundError, VehicleNotFoundError, eh
-from vehicle_manager.nats import GetNats
+from vehicle_manager.delta_outbox import (
+    GetDeltaOutbox,
+    enqueue_veh_delta,
+    enqueue_veh_deltas,
+)
+from vehicle_manager.errors import (
+    GeofenceNotFoundError,
+    InvalidCursorError,
+    TrajectoryTooLargeError,
+    VehicleNotFoundError,
+    eh,
+)
+from vehicle_manager.geofence_cache import GetGeofenceCache
+from vehicle_manager.pagination import (
+    DEFAULT_PAGE_SIZE,
+    Page,
+    PageSize,
+    decode_cursor,
+    encode_cursor,
+)
+from vehicle_manager.retention import downsample_watermark
 from vehicle_manager.settings import GetSettings
+from vehicle_manager.state_cache import GetStateCache
+from vehicle_manager.trajectory import (
+    GetTrajectoryCache,
+    TrajectoryRead,
+    encode_polyline,
+    simplify,
+    zoom_tolerance,
+)
 
 
 def todo(reason: str):
@@ -101,6 +162,13 @@ class GeofenceRead(GeofenceBase):
     model_config = {"from_attributes": True}
 
 
+class AssignmentItem(BaseModel):
+    geofence_id: UUID
+    vehicle_id: UUID
+
+    model_config = {"frozen": True}
+
+
 class BaseEventRead(BaseModel):
     ts: datetime
 
@@ -154,6 +222,12 @@ VEH_RESPONSES_DICT: dict[str | int, Any] = {
 GEO_RESPONSES_DICT: dict[str | int, Any] = {
     404: eh.generate_swagger_response(GeofenceNotFoundError)
 }
+CURSOR_RESPONSES_DICT: dict[str | int, Any] = {
+    400: eh.generate_swagger_response(InvalidCursorError)
+}
+TRAJECTORY_RESPONSES_DICT: dict[str | int, Any] = {
+    400: eh.generate_swagger_response(TrajectoryTooLargeError)
+}
 BOTH_RESPONSES_DICT: dict[str | int, Any] = {
     404: eh.generate_swagger_response(VehicleNotFoundError, GeofenceNotFoundError)
 }
@@ -170,6 +244,68 @@ async def list_vehicles(
     return list(result.all())
 
 
+MAX_BATCH_IDS = 1000
+MAX_BULK_ITEMS = 10000
+
+# Ids for the batch endpoints, repeated as `?ids=...&ids=...`.
+BatchIds = Annotated[list[UUID], Query(max_length=MAX_BATCH_IDS)]
+
+
+def _any_of(column: InstrumentedAttribute[UUID], ids: list[UUID]):
+    """`column = ANY(:ids)`, one bound array however many ids there are."""
+    return column == any_(bindparam(None, ids, type_=ARRAY(Uuid)))
+
+
+@router.get("/vehicles")
+async def get_vehicles(
+    db: GetDb,
+    ids: BatchIds,
+) -> list[VehicleRead]:
+    """The vehicles with the given ids, skipping ids that don't exist."""
+    stmt = select(Vehicle).where(_any_of(Vehicle.id, ids))
+    return [VehicleRead.model_validate(v) for v in await db.scalars(stmt)]
+
+
+_SnapshotAdapter = TypeAdapter[list[VehicleRead]](list[VehicleRead])
+
+
+@router.get(
+    "/vehicles_snapshot",
+    response_model=list[VehicleRead],
+    responses={304: {"description": "Not modified."}},
+)
+async def get_vehicles_snapshot(
+    db: GetDb,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """All active vehicles with their current state, for dashboards that would
+    otherwise fetch them one by one.
+
+    The ETag is a hash the database computes over the rows, so a poll with
+    `If-None-Match` gets an empty 304 without the vehicles being loaded or
+    serialised while nothing has changed. Positions are part of the snapshot, so
+    this only helps while the fleet is idle. A vehicle that is reporting changes
+    the ETag with every position.
+    """
+    stmt = select(
+        func.md5(
+            func.string_agg(
+                literal_column("vehicle::text"),
+                aggregate_order_by(literal_column("','"), Vehicle.id),
+            )
+        )
+    ).where(Vehicle.active.is_(True))
+    etag = f'"{await db.scalar(stmt) or "empty"}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    stmt = select(Vehicle).where(Vehicle.active.is_(True)).order_by(Vehicle.id)
+    vehicles = [VehicleRead.model_validate(v) for v in await db.scalars(stmt)]
+    body = _SnapshotAdapter.dump_json(vehicles)
+    return Response(body, media_type="application/json", headers=headers)
+
+
 @router.get("/vehicles/{id}", responses=VEH_RESPONSES_DICT)
 async def get_vehicle(
     db: GetDb,
@@ -185,8 +321,7 @@ async def get_vehicle(
 @router.post("/vehicles/")
 async def create_vehicle(
     db: GetDb,
-    nc: GetNats,
-    settings: GetSettings,
+    outbox: GetDeltaOutbox,
     user_id: GetUserId,
     payload: VehicleCreate,
 ) -> VehicleRead:
@@ -205,17 +340,51 @@ async def create_vehicle(
 
     event = VehicleCreated(ts=ts, vehicle_id=vehicle.id, user_id=user_id)
     db.add(event)
-
-    await send_veh_delta(nc, settings, vehicle)
+    enqueue_veh_delta(db, outbox, vehicle.id)
 
     return VehicleRead.model_validate(vehicle)
 
 
+@router.post("/vehicles/bulk")
+async def create_vehicles(
+    db: GetDb,
+    outbox: GetDeltaOutbox,
+    user_id: GetUserId,
+    payload: Annotated[list[VehicleCreate], Body(max_length=MAX_BULK_ITEMS)],
+) -> list[VehicleRead]:
+    """Creates many vehicles at once. The controllers are told about all of them
+    together."""
+    ts = datetime.now(UTC)
+    vehicles = [
+        {
+            "id": uuid4(),
+            "active": True,
+            "name": item.name,
+            "vtype": item.vtype,
+            "vconfig": item.vconfig.model_dump(),
+            "immobilized": False,
+            "lat": None,
+            "lon": None,
+        }
+        for item in payload
+    ]
+    if not vehicles:
+        return []
+
+    await db.execute(insert(Vehicle), vehicles)
+    await db.execute(
+        insert(VehicleCreated),
+        [{"ts": ts, "vehicle_id": v["id"], "user_id": user_id} for v in vehicles],
+    )
+    await enqueue_veh_deltas(db, outbox, [v["id"] for v in vehicles])
+
+    return [VehicleRead.model_validate(v) for v in vehicles]
+
+
 @router.put("/vehicles/{id}", responses=VEH_RESPONSES_DICT)
 async def update_vehicle(
     db: GetDb,
-    nc: GetNats,
-    settings: GetSettings,
+    outbox: GetCommandOutbox,
     user_id: GetUserId,
     id: UUID,
     payload: VehicleUpdate,
@@ -227,7 +396,8 @@ async def update_vehicle(
     modified = False
 
     if payload.immobilized is not None and payload.immobilized != vehicle.immobilized:
-        await transmit_immobilize(nc, settings, id, user_id, None, payload.immobilized)
+        cmd = ImmobilizeCommand(id, payload.immobilized, user_id, None)
+        on_commit(db, partial(outbox.enqueue, cmd))
 
     if payload.name is not None and payload.name != vehicle.name:
         vehicle.name = payload.name
@@ -245,8 +415,8 @@ async def update_vehicle(
 @router.delete("/vehicles/{id}", responses=VEH_RESPONSES_DICT)
 async def delete_vehicle(
     db: GetDb,
-    nc: GetNats,
-    settings: GetSettings,
+    outbox: GetDeltaOutbox,
+    cache: GetStateCache,
     user_id: GetUserId,
     id: UUID,
 ) -> None:
@@ -257,8 +427,8 @@ async def delete_vehicle(
     vehicle.active = False
     event = VehicleDeleted(ts=datetime.now(UTC), vehicle_id=vehicle.id, user_id=user_id)
     db.add(event)
-
-    await send_veh_delta(nc, settings, vehicle)
+    enqueue_veh_delta(db, outbox, id)
+    on_commit(db, lambda: cache.invalidate_vehicle(id))
 
 
 @router.get("/geofences/")
@@ -272,6 +442,16 @@ async def list_geofences(
     return list(result.all())
 
 
+@router.get("/geofences")
+async def get_geofences(
+    db: GetDb,
+    ids: BatchIds,
+) -> list[GeofenceRead]:
+    """The geofences with the given ids, skipping ids that don't exist."""
+    stmt = select(Geofence).where(_any_of(Geofence.id, ids))
+    return [GeofenceRead.model_validate(g) for g in await db.scalars(stmt)]
+
+
 @router.get("/geofences/{id}", responses=GEO_RESPONSES_DICT)
 async def get_geofence(
     db: GetDb,
@@ -287,6 +467,7 @@ async def get_geofence(
 @router.post("/geofences/")
 async def create_geofence(
     db: GetDb,
+    cache: GetGeofenceCache,
     user_id: GetUserId,
     payload: GeofenceCreate,
 ) -> GeofenceRead:
@@ -303,13 +484,53 @@ async def create_geofence(
 
     event = GeofenceCreated(ts=ts, geofence_id=geofence.id, user_id=user_id)
     db.add(event)
+    on_commit(
+        db,
+        partial(
+            cache.put,
+            geofence.id,
+            payload.data,
+            payload.immobilize_enter,
+            payload.immobilize_leave,
+        ),
+    )
 
     return GeofenceRead.model_validate(geofence)
 
 
+@router.post("/geofences/bulk")
+async def create_geofences(
+    db: GetDb,
+    cache: GetGeofenceCache,
+    user_id: GetUserId,
+    payload: Annotated[list[GeofenceCreate], Body(max_length=MAX_BULK_ITEMS)],
+) -> list[GeofenceRead]:
+    ts = datetime.now(UTC)
+    geofences = [
+        {"id": uuid4(), "active": True, **item.model_dump()} for item in payload
+    ]
+    if not geofences:
+        return []
+
+    await db.execute(insert(Geofence), geofences)
+    await db.execute(
+        insert(GeofenceCreated),
+        [{"ts": ts, "geofence_id": g["id"], "user_id": user_id} for g in geofences],
+    )
+
+    def put_cache():
+        for g in geofences:
+            cache.put(g["id"], g["data"], g["immobilize_enter"], g["immobilize_leave"])
+
+    on_commit(db, put_cache)
+
+    return [GeofenceRead.model_validate(g) for g in geofences]
+
+
 @router.put("/geofences/{id}", responses=GEO_RESPONSES_DICT)
 async def update_geofence(
     db: GetDb,
+    cache: GetGeofenceCache,
     user_id: GetUserId,
     id: UUID,
     payload: GeofenceUpdate,
@@ -345,11 +566,22 @@ async def update_geofence(
             user_id=user_id,
         )
         db.add(event)
+        on_commit(
+            db,
+            partial(
+                cache.put,
+                id,
+                geofence.data,
+                geofence.immobilize_enter,
+                geofence.immobilize_leave,
+            ),
+        )
 
 
 @router.delete("/geofences/{id}", responses=GEO_RESPONSES_DICT)
 async def delete_geofence(
     db: GetDb,
+    cache: GetGeofenceCache,
     user_id: GetUserId,
     id: UUID,
 ) -> None:
@@ -362,6 +594,39 @@ async def delete_geofence(
         ts=datetime.now(UTC), geofence_id=geofence.id, user_id=user_id
     )
     db.add(event)
+    on_commit(db, lambda: cache.invalidate(id))
+
+
+@router.get("/geofence_vehicles")
+async def list_vehicles_in_geofence_assignments(
+    db: GetDb,
+    geofence_ids: BatchIds,
+) -> dict[UUID, list[UUID]]:
+    """Assigned vehicles for each of the given geofences."""
+    stmt = select(VehicleGeofence.geofence_id, VehicleGeofence.vehicle_id).where(
+        _any_of(VehicleGeofence.geofence_id, geofence_ids)
+    )
+    result: dict[UUID, list[UUID]] = {id: [] for id in geofence_ids}
+    for geofence_id, vehicle_id in await db.execute(stmt):
+        result[geofence_id].append(vehicle_id)
+
+    return result
+
+
+@router.get("/vehicle_geofences")
+async def list_geofences_assigned_to_vehicles(
+    db: GetDb,
+    vehicle_ids: BatchIds,
+) -> dict[UUID, list[UUID]]:
+    """Assigned geofences for each of the given vehicles."""
+    stmt = select(VehicleGeofence.vehicle_id, VehicleGeofence.geofence_id).where(
+        _any_of(VehicleGeofence.vehicle_id, vehicle_ids)
+    )
+    result: dict[UUID, list[UUID]] = {id: [] for id in vehicle_ids}
+    for vehicle_id, geofence_id in await db.execute(stmt):
+        result[vehicle_id].append(geofence_id)
+
+    return result
 
 
 @router.get("/geofence_vehicles/{geofence_id}/")
@@ -396,6 +661,7 @@ async def list_geofences_assigned_to_vehicle(
 )
 async def assign_vehicle_to_geofence(
     db: GetDb,
+    cache: GetStateCache,
     geofence_id: UUID,
     vehicle_id: UUID,
 ) -> None:
@@ -415,6 +681,44 @@ async def assign_vehicle_to_geofence(
 
     assoc = VehicleGeofence(vehicle_id=vehicle_id, geofence_id=geofence_id)
     db.add(assoc)
+    on_commit(db, lambda: cache.invalidate_vehicle(vehicle_id))
+
+
+@router.post("/geofence_vehicles/bulk", responses=BOTH_RESPONSES_DICT)
+async def assign_vehicles_to_geofences(
+    db: GetDb,
+    cache: GetStateCache,
+    payload: Annotated[list[AssignmentItem], Body(max_length=MAX_BULK_ITEMS)],
+) -> None:
+    """Adds many assignments at once. Nothing is assigned if any of the vehicles
+    or geofences doesn't exist, assignments that already exist are skipped."""
+    if not payload:
+        return
+    vehicle_ids = list({item.vehicle_id for item in payload})
+    geofence_ids = list({item.geofence_id for item in payload})
+
+    stmt = select(func.count()).where(
+        Vehicle.active.is_(True), _any_of(Vehicle.id, vehicle_ids)
+    )
+    if await db.scalar(stmt) != len(vehicle_ids):
+        raise VehicleNotFoundError()
+
+    stmt = select(func.count()).where(
+        Geofence.active.is_(True), _any_of(Geofence.id, geofence_ids)
+    )
+    if await db.scalar(stmt) != len(geofence_ids):
+        raise GeofenceNotFoundError()
+
+    await db.execute(
+        pg_insert(VehicleGeofence).on_conflict_do_nothing(),
+        [item.model_dump() for item in set(payload)],
+    )
+
+    def invalidate_cache():
+        for vehicle_id in vehicle_ids:
+            cache.invalidate_vehicle(vehicle_id)
+
+    on_commit(db, invalidate_cache)
 
 
 @router.delete(
@@ -422,6 +726,7 @@ async def assign_vehicle_to_geofence(
 )
 async def remove_vehicle_from_geofence(
     db: GetDb,
+    cache: GetStateCache,
     geofence_id: UUID,
     vehicle_id: UUID,
 ) -> None:
@@ -433,31 +738,182 @@ async def remove_vehicle_from_geofence(
     assoc = await db.scalar(stmt)
     if assoc:
         await db.delete(assoc)
+        on_commit(db, lambda: cache.invalidate_vehicle(vehicle_id))
+
 
+_PosCursor = TypeAdapter[datetime](datetime)
 
-@router.get("/vehicle_positions/{id}")
+
+@router.get("/vehicle_positions/{id}", responses=CURSOR_RESPONSES_DICT)
 async def get_vehicle_positions(
     db: GetDb,
     id: UUID,
     start_date: datetime | None = None,
     end_date: datetime | None = None,
-    limit: Annotated[int, Query(ge=0)] = 0,
-) -> list[PosRead]:
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+) -> Page[PosRead]:
     stmt = select(VehiclePos).where(VehiclePos.vehicle_id == id)
 
     if start_date:
         stmt = stmt.where(VehiclePos.ts >= start_date)
     if end_date:
         stmt = stmt.where(VehiclePos.ts <= end_date)
+    if cursor:
+        stmt = stmt.where(VehiclePos.ts < decode_cursor(_PosCursor, cursor))
 
-    stmt = stmt.order_by(VehiclePos.ts.desc())
+    # One row more than requested tells whether there is another page.
+    stmt = stmt.order_by(VehiclePos.ts.desc()).limit(limit + 1)
 
-    if limit > 0:
-        stmt = stmt.limit(limit)
+    rows = list(await db.scalars(stmt))
+    items = [PosRead.model_validate(r) for r in rows[:limit]]
+    next_cursor = encode_cursor(_PosCursor, items[-1].ts) if len(rows) > limit else None
+
+    return Page(items=items, next_cursor=next_cursor)
+
+
+_EXPORT_CHUNK_ROWS = 1000
+_EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
 
-    result = await db.scalars(stmt)
 
-    return [PosRead.model_validate(r) for r in result.all()]
+async def _export_positions(
+    dsm: DatabaseSessionManager,
+    vehicle_id: UUID | None,
+    start_date: datetime | None,
+    end_date: datetime | None,
+    format: Literal["ndjson", "csv"],
+) -> AsyncIterator[str]:
+    stmt = select(VehiclePos.vehicle_id, VehiclePos.ts, VehiclePos.lat, VehiclePos.lon)
+
+    if vehicle_id:
+        stmt = stmt.where(VehiclePos.vehicle_id == vehicle_id)
+    if start_date:
+        stmt = stmt.where(VehiclePos.ts >= start_date)
+    if end_date:
+        stmt = stmt.where(VehiclePos.ts <= end_date)
+
+    stmt = stmt.order_by(VehiclePos.vehicle_id, VehiclePos.ts).execution_options(
+        yield_per=_EXPORT_CHUNK_ROWS
+    )
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if format == "csv":
+        writer.writerow(("vehicle_id", "ts", "lat", "lon"))
+
+    # The response outlives the request's own session, so the export reads through
+    # a server-side cursor in a session of its own.
+    async with dsm.session() as db:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            for vid, ts, lat, lon in rows:
+                if format == "csv":
+                    writer.writerow((vid, ts.isoformat(), lat, lon))
+                else:
+                    buf.write(
+                        json.dumps(
+                            {
+                                "vehicle_id": str(vid),
+                                "ts": ts.isoformat(),
+                                "lat": lat,
+                                "lon": lon,
+                            }
+                        )
+                    )
+                    buf.write("\n")
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+@router.get("/vehicle_positions_export", response_class=StreamingResponse)
+async def export_vehicle_positions(
+    dsm: GetDatabaseSessionManager,
+    vehicle_id: UUID | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    format: Literal["ndjson", "csv"] = "ndjson",
+) -> StreamingResponse:
+    """Streams the position history of one vehicle, or of all of them, in chunks
+    of rows as they come from the database."""
+    return StreamingResponse(
+        _export_positions(dsm, vehicle_id, start_date, end_date, format),
+        media_type=_EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="positions.{format}"'},
+    )
+
+
+# Trajectories are built in memory, so a time range with more positions than
+# this is refused rather than loaded.
+MAX_TRAJECTORY_POSITIONS = 200_000
+
+
+def _as_utc(dt: datetime) -> datetime:
+    """Treats a timestamp without a timezone as UTC."""
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=UTC)
+
+
+@router.get("/vehicle_trajectory/{id}", responses=TRAJECTORY_RESPONSES_DICT)
+async def get_vehicle_trajectory(
+    db: GetDb,
+    cache: GetTrajectoryCache,
+    settings: GetSettings,
+    id: UUID,
+    start_date: datetime,
+    end_date: datetime,
+    tolerance: Annotated[float | None, Query(ge=0)] = None,
+    zoom: Annotated[int | None, Query(ge=0, le=24)] = None,
+) -> TrajectoryRead:
+    """The vehicle's track simplified to `tolerance` degrees, or to about one pixel
+    at map `zoom` level. Without either, every point is returned. Dates without a
+    timezone are taken as UTC."""
+    if tolerance is None:
+        tolerance = zoom_tolerance(zoom) if zoom is not None else 0.0
+    start_date, end_date = _as_utc(start_date), _as_utc(end_date)
+
+    now = datetime.now(UTC)
+    retained = settings.pos_retention_days is None or start_date >= now - timedelta(
+        days=settings.pos_retention_days
+    )
+    key = None
+    if end_date < now and retained:
+        # Downsampling rewrites the range while its watermark passes through it,
+        # and leaves it alone before and after.
+        watermark = await downsample_watermark(db)
+        progress = min(max(watermark, start_date), end_date) if watermark else None
+        key = (id, start_date, end_date, tolerance, progress)
+        if cached := cache.get(key):
+            return cached
+
+    stmt = (
+        select(VehiclePos.ts, VehiclePos.lon, VehiclePos.lat)
+        .where(VehiclePos.vehicle_id == id)
+        .where(VehiclePos.ts >= start_date)
+        .where(VehiclePos.ts <= end_date)
+        .order_by(VehiclePos.ts)
+        .limit(MAX_TRAJECTORY_POSITIONS + 1)
+    )
+    rows = (await db.execute(stmt)).all()
+    if len(rows) > MAX_TRAJECTORY_POSITIONS:
+        raise TrajectoryTooLargeError()
+
+    coords = simplify(
+        np.array([(lon, lat) for _, lon, lat in rows], dtype=float).reshape(-1, 2),
+        tolerance,
+    )
+    trajectory = TrajectoryRead(
+        polyline=encode_polyline((lat, lon) for lon, lat in coords),
+        points=len(coords),
+        raw_points=len(rows),
+        start_ts=rows[0].ts if rows else None,
+        end_ts=rows[-1].ts if rows else None,
+    )
+
+    if key:
+        cache.put(key, trajectory)
+    return trajectory
 
 
 # Vibe coding ahead
@@ -472,90 +928,163 @@ type EventTypes = (
 )
 
 
-@router.get("/vehicle_events/{id}")
-async def get_vehicle_events(
-    db: GetDb,
-    id: UUID,
-    start_date: datetime | None = None,
-    end_date: datetime | None = None,
-    limit: Annotated[int, Query(ge=0)] = 0,
-) -> list[EventTypes]:
-    queries: list[tuple[type[VehicleEvent], type[EventTypes]]] = [
-        (VehicleCreated, CreatedEventRead),
-        (VehicleDeleted, DeletedEventRead),
-        (VehicleModified, ModifiedEventRead),
-        (VehicleImmobilized, ImmobilizedEventRead),
-        (VehicleGeofenceEvent, GeofenceEventRead),
-    ]
+_EVENT_SCHEMAS: dict[str, type[EventTypes]] = {
+    "created": CreatedEventRead,
+    "deleted": DeletedEventRead,
+    "modified": ModifiedEventRead,
+    "immobilized": ImmobilizedEventRead,
+    "geofence": GeofenceEventRead,
+}
 
-    results: list[EventTypes] = []
+# Columns of the unified timeline, NULL where an event type doesn't have them.
+_EVENT_COLUMNS: dict[str, TypeEngine[Any]] = {
+    "user_id": String(80),
+    "vehicle_id": Uuid(),
+    "geofence_id": Uuid(),
+    "immobilized": Boolean(),
+    "entered": Boolean(),
+}
 
-    for model, schema in queries:
-        stmt = select(model).where(model.vehicle_id == id)
+# Events are ordered by (ts, type, vehicle_id, geofence_id), newest first. That
+# is unique across all event tables, with the nil UUID standing in for NULL.
+_EventCursor = TypeAdapter[tuple[datetime, str, UUID, UUID]](
+    tuple[datetime, str, UUID, UUID]
+)
+_NIL = UUID(int=0)
+
+
+async def _get_events(
+    db: AsyncSession,
+    sources: list[tuple[type[EventWithTs], str, InstrumentedAttribute[UUID]]],
+    id: UUID,
+    start_date: datetime | None,
+    end_date: datetime | None,
+    limit: int,
+    cursor: str | None,
+) -> Page[EventTypes]:
+    """Reads a page of the newest events of several tables as one UNION ALL query.
+
+    `sources` are `(model, type, key column)` triples. Every branch is ordered
+    and limited by itself as well, so none of them reads more than a page.
+    """
+    after = decode_cursor(_EventCursor, cursor) if cursor else None
+
+    branches = []
+    for model, event_type, key in sources:
+        ts = model.ts
+        vehicle_key, geofence_key = (
+            func.coalesce(getattr(model, name), _NIL)
+            if hasattr(model, name)
+            else literal(_NIL, Uuid)
+            for name in ("vehicle_id", "geofence_id")
+        )
+        stmt = select(
+            literal(event_type, String).label("type"),
+            ts.label("ts"),
+            *(
+                getattr(model, name, cast(null(), type_)).label(name)
+                for name, type_ in _EVENT_COLUMNS.items()
+            ),
+            vehicle_key.label("vehicle_key"),
+            geofence_key.label("geofence_key"),
+        ).where(key == id)
 
         if start_date:
-            stmt = stmt.where(model.ts >= start_date)
+            stmt = stmt.where(ts >= start_date)
         if end_date:
-            stmt = stmt.where(model.ts <= end_date)
-
-        stmt = stmt.order_by(model.ts.desc())
+            stmt = stmt.where(ts <= end_date)
+        if after:
+            # The plain bound on ts is what the index seek uses.
+            stmt = stmt.where(
+                ts <= after[0],
+                tuple_(ts, literal(event_type, String), vehicle_key, geofence_key)
+                < tuple_(*after),
+            )
+
+        order_by = [ts.desc()]
+        order_by += [
+            getattr(model, name).desc()
+            for name in ("vehicle_id", "geofence_id")
+            if hasattr(model, name)
+        ]
+        stmt = stmt.order_by(*order_by).limit(limit + 1)
+        branches.append(stmt)
 
-        if limit > 0:
-            stmt = stmt.limit(limit)
+    timeline = union_all(*branches).subquery()
+    stmt = (
+        select(timeline)
+        .order_by(
+            timeline.c.ts.desc(),
+            timeline.c.type.desc(),
+            timeline.c.vehicle_key.desc(),
+            timeline.c.geofence_key.desc(),
+        )
+        .limit(limit + 1)
+    )
 
-        rows = await db.scalars(stmt)
-        results += [schema.model_validate(r) for r in rows]
+    rows = list(await db.execute(stmt))
+    items = [_EVENT_SCHEMAS[row.type].model_validate(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(
+            _EventCursor, (last.ts, last.type, last.vehicle_key, last.geofence_key)
+        )
 
-    results.sort(key=lambda x: x.ts, reverse=True)
+    return Page(items=items, next_cursor=next_cursor)
 
-    if limit > 0:
-        return results[:limit]
 
-    return results
+@router.get("/vehicle_events/{id}", responses=CURSOR_RESPONSES_DICT)
+async def get_vehicle_events(
+    db: GetDb,
+    id: UUID,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+) -> Page[EventTypes]:
+    sources: list[tuple[type[VehicleEvent], str]] = [
+        (VehicleCreated, "created"),
+        (VehicleDeleted, "deleted"),
+        (VehicleModified, "modified"),
+        (VehicleImmobilized, "immobilized"),
+        (VehicleGeofenceEvent, "geofence"),
+    ]
+    return await _get_events(
+        db,
+        [(model, event_type, model.vehicle_id) for model, event_type in sources],
+        id,
+        start_date,
+        end_date,
+        limit,
+        cursor,
+    )
 
 
-@router.get("/geofence_events/{id}")
+@router.get("/geofence_events/{id}", responses=CURSOR_RESPONSES_DICT)
 async def get_geofence_events(
     db: GetDb,
     id: UUID,
     start_date: datetime | None = None,
     end_date: datetime | None = None,
-    limit: Annotated[int, Query(ge=0)] = 0,
-) -> list[EventTypes]:
-    queries: list[
-        tuple[
-            type[GeofenceEvent | VehicleGeofenceEvent | VehicleImmobilized],
-            type[EventTypes],
-        ]
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+) -> Page[EventTypes]:
+    sources: list[
+        tuple[type[GeofenceEvent | VehicleGeofenceEvent | VehicleImmobilized], str]
     ] = [
-        (GeofenceCreated, CreatedEventRead),
-        (GeofenceDeleted, DeletedEventRead),
-        (GeofenceModified, ModifiedEventRead),
-        (VehicleImmobilized, ImmobilizedEventRead),
-        (VehicleGeofenceEvent, GeofenceEventRead),
+        (GeofenceCreated, "created"),
+        (GeofenceDeleted, "deleted"),
+        (GeofenceModified, "modified"),
+        (VehicleImmobilized, "immobilized"),
+        (VehicleGeofenceEvent, "geofence"),
     ]
-
-    results: list[EventTypes] = []
-
-    for model, schema in queries:
-        stmt = select(model).where(model.geofence_id == id)
-
-        if start_date:
-            stmt = stmt.where(model.ts >= start_date)
-        if end_date:
-            stmt = stmt.where(model.ts <= end_date)
-
-        stmt = stmt.order_by(model.ts.desc())
-
-        if limit > 0:
-            stmt = stmt.limit(limit)
-
-        rows = await db.scalars(stmt)
-        results += [schema.model_validate(r) for r in rows]
-
-    results.sort(key=lambda x: x.ts, reverse=True)
-
-    if limit > 0:
-        return results[:limit]
-
-    return results
+    return await _get_events(
+        db,
+        [(model, event_type, model.geofence_id) for model, event_type in sources],
+        id,
+        start_date,
+        end_date,
+        limit,
+        cursor,
+    )
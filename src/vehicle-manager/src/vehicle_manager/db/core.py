@@ -1,7 +1,9 @@
+from collections.abc import Callable
 from contextlib import asynccontextmanager
 from typing import Annotated, Any, AsyncIterator
 
 from fastapi import Depends, Request
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncSession,
@@ -34,6 +36,11 @@ class DatabaseSessionManager:
             yield session
 
 
+def on_commit(db: AsyncSession, fn: Callable[[], None]):
+    """Runs `fn` once the session's current transaction has been committed."""
+    event.listen(db.sync_session, "after_commit", lambda _: fn(), once=True)
+
+
 async def get_db(request: Request):
     session_maker: DatabaseSessionManager = request.app.state.db_session_manager
     async with session_maker.session() as session:
@@ -41,3 +48,12 @@ async def get_db(request: Request):
 
 
 GetDb = Annotated[AsyncSession, Depends(get_db)]
+
+
+async def get_db_session_manager(request: Request) -> DatabaseSessionManager:
+    return request.app.state.db_session_manager
+
+
+GetDatabaseSessionManager = Annotated[
+    DatabaseSessionManager, Depends(get_db_session_manager)
+]
@@ -3,7 +3,7 @@ from typing import Any
 from uuid import UUID, uuid4
 
 from pydantic import BaseModel
-from sqlalchemy import DateTime, ForeignKey, String, TypeDecorator
+from sqlalchemy import BigInteger, DateTime, ForeignKey, String, TypeDecorator
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, MappedAsDataclass, mapped_column
 
@@ -59,6 +59,30 @@ class Geofence(Base):
     immobilize_leave: Mapped[bool] = mapped_column()
 
 
+class VehicleDeltaOutbox(Base):
+    """Vehicles whose configuration changed and still has to be announced to the
+    controllers. Rows are written in the same transaction as the change."""
+
+    __tablename__ = "vehicle_delta_outbox"
+
+    id: Mapped[int] = mapped_column(
+        BigInteger,
+        primary_key=True,
+        autoincrement=True,
+        init=False,
+    )
+    vehicle_id: Mapped[UUID] = mapped_column(ForeignKey(Vehicle.id))
+
+
+class RetentionWatermark(Base):
+    """How far a background job has worked through the history."""
+
+    __tablename__ = "retention_watermark"
+
+    job: Mapped[str] = mapped_column(String(64), primary_key=True)
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
 class VehicleGeofence(Base):
     __tablename__ = "vehicle_geofence"
 
@@ -86,6 +110,8 @@ class VehicleEvent(EventWithTs):
 
 class VehiclePos(VehicleEvent):
     __tablename__ = "vehicle_pos"
+    # Partitions are managed by `vehicle_manager.partitions`.
+    __table_args__ = {"postgresql_partition_by": "RANGE (ts)"}
 
     lat: Mapped[float] = mapped_column()
     lon: Mapped[float] = mapped_column()
@@ -113,6 +139,8 @@ class VehicleImmobilized(VehicleEvent):
 
 class VehicleGeofenceEvent(VehicleEvent):
     __tablename__ = "vehicle_geofence_event"
+    # Partitions are managed by `vehicle_manager.partitions`.
+    __table_args__ = {"postgresql_partition_by": "RANGE (ts)"}
 
     geofence_id: Mapped[UUID] = mapped_column(ForeignKey(Geofence.id), primary_key=True)
     entered: Mapped[bool] = mapped_column()
@@ -0,0 +1,64 @@
+import asyncio
+from collections.abc import Collection
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import Depends, FastAPI, Request
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from vehicle_manager.db.core import on_commit
+from vehicle_manager.db.models import VehicleDeltaOutbox
+
+
+class DeltaOutbox:
+    """Wakes the vehicle delta publisher when new outbox rows were committed.
+
+    The rows themselves live in the database, so this only saves the publisher
+    from waiting for its next poll.
+    """
+
+    def __init__(self) -> None:
+        self._committed = asyncio.Event()
+
+    def notify(self) -> None:
+        self._committed.set()
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            async with asyncio.timeout(timeout):
+                await self._committed.wait()
+        except TimeoutError:
+            pass
+        self._committed.clear()
+
+
+def enqueue_veh_delta(db: AsyncSession, outbox: DeltaOutbox, vehicle_id: UUID):
+    """Schedules the current configuration of the vehicle to be announced once the
+    session's transaction commits."""
+    db.add(VehicleDeltaOutbox(vehicle_id=vehicle_id))
+    on_commit(db, outbox.notify)
+
+
+async def enqueue_veh_deltas(
+    db: AsyncSession, outbox: DeltaOutbox, vehicle_ids: Collection[UUID]
+):
+    """Like `enqueue_veh_delta`, for many vehicles with one bulk insert."""
+    if not vehicle_ids:
+        return
+    await db.execute(
+        insert(VehicleDeltaOutbox), [{"vehicle_id": id} for id in vehicle_ids]
+    )
+    on_commit(db, outbox.notify)
+
+
+async def get_delta_outbox_from_fastapi(app: FastAPI) -> DeltaOutbox:
+    outbox: DeltaOutbox = app.state.delta_outbox
+    return outbox
+
+
+async def get_delta_outbox(request: Request) -> DeltaOutbox:
+    return await get_delta_outbox_from_fastapi(request.app)
+
+
+GetDeltaOutbox = Annotated[DeltaOutbox, Depends(get_delta_outbox)]
@@ -27,4 +27,14 @@ class GeofenceNotFoundError(StatusProblem):
     title = "Geofence not found."
 
 
+class InvalidCursorError(StatusProblem):
+    status = 400
+    title = "Invalid pagination cursor."
+
+
+class TrajectoryTooLargeError(StatusProblem):
+    status = 400
+    title = "Too many positions in the time range."
+
+
 eh = new_exception_handler()
@@ -0,0 +1,243 @@
+import asyncio
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, replace
+from itertools import count
+from time import monotonic
+from typing import Annotated, Any
+from uuid import UUID
+
+import numpy as np
+import shapely
+from fastapi import Depends, FastAPI, Request
+from shapely.geometry import shape
+from shapely.geometry.base import BaseGeometry
+from shapely.strtree import STRtree
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from vehicle_manager.db.models import Geofence
+
+
+@dataclass(frozen=True)
+class CompiledGeofence:
+    id: UUID
+    version: int
+    geometry: BaseGeometry
+    bounds: tuple[float, float, float, float]
+    immobilize_enter: bool
+    immobilize_leave: bool
+
+
+def compile_geofence(
+    id: UUID,
+    version: int,
+    data: Any,
+    immobilize_enter: bool,
+    immobilize_leave: bool,
+) -> CompiledGeofence | None:
+    try:
+        geometry = shape(data)
+    except Exception:
+        return None
+    shapely.prepare(geometry)
+    return CompiledGeofence(
+        id,
+        version,
+        geometry,
+        geometry.bounds,
+        immobilize_enter,
+        immobilize_leave,
+    )
+
+
+# Below this many geofences a linear scan over the bounding boxes beats the tree.
+_INDEX_MIN_SIZE = 8
+
+
+class GeofenceIndex:
+    """Spatial index over the bounding boxes of a set of geofences."""
+
+    def __init__(self, geofences: Iterable[CompiledGeofence]) -> None:
+        self.geofences = list(geofences)
+        self._bounds = np.array([gf.bounds for gf in self.geofences]).reshape(-1, 4)
+        self._tree = (
+            STRtree(shapely.box(*self._bounds.T))
+            if len(self.geofences) >= _INDEX_MIN_SIZE
+            else None
+        )
+
+    def query(self, lon: np.ndarray, lat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Pairs of (point index, geofence index) where the point lies within the
+        geofence's bounding box.
+
+        A geofence whose bounding box contains none of a vehicle's points can't
+        contain them either, so it can't change state between them.
+        """
+        if self._tree is None:
+            min_x, min_y, max_x, max_y = self._bounds.T
+            lon = lon[:, np.newaxis]
+            lat = lat[:, np.newaxis]
+            inside = (min_x <= lon) & (lon <= max_x) & (min_y <= lat) & (lat <= max_y)
+            points, geofences = np.nonzero(inside)
+            return points, geofences
+        points, geofences = self._tree.query(shapely.points(lon, lat))
+        return points, geofences
+
+
+class GeofenceCache:
+    """Process-local cache of parsed and prepared geofence geometries.
+
+    Every write to a geofence bumps its version, and entries are keyed by
+    `(id, version)` so anything derived from an older compilation can be told
+    apart. Inactive geofences and ones with unparseable data are cached as absent.
+
+    Writes are announced over NATS so the other replicas drop their entries (see
+    `run_cache_sync`), and entries are reloaded after `ttl` seconds in case an
+    announcement is lost.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self._entries: dict[UUID, tuple[float, CompiledGeofence | None]] = {}
+        self._versions: dict[UUID, int] = {}
+        self._counter = count(1)
+        self._ttl = ttl
+        self._announced = set[UUID]()
+        self._has_announced = asyncio.Event()
+        self._index = GeofenceIndex(())
+        self._index_key = frozenset[tuple[UUID, int]]()
+
+    def _bump(self, geofence_id: UUID) -> int:
+        version = self._versions[geofence_id] = next(self._counter)
+        return version
+
+    async def get_many(
+        self, db: AsyncSession, geofence_ids: Iterable[UUID]
+    ) -> dict[UUID, CompiledGeofence]:
+        now = monotonic()
+        ret: dict[UUID, CompiledGeofence] = {}
+        missing: dict[UUID, int] = {}
+        for gid in set(geofence_ids):
+            entry = self._entries.get(gid)
+            if entry is not None and now - entry[0] <= self._ttl:
+                if entry[1] is not None:
+                    ret[gid] = entry[1]
+                continue
+            missing[gid] = self._versions.get(gid, 0)
+        if not missing:
+            return ret
+
+        loaded: dict[UUID, CompiledGeofence | None] = dict.fromkeys(missing)
+        stmt = select(Geofence).where(
+            and_(Geofence.id.in_(list(missing)), Geofence.active.is_(True))
+        )
+        for gf in await db.scalars(stmt):
+            loaded[gf.id] = compile_geofence(
+                gf.id,
+                missing[gf.id],
+                gf.data,
+                gf.immobilize_enter,
+                gf.immobilize_leave,
+            )
+
+        for gid, entry in loaded.items():
+            # Don't store anything that was written while we were loading.
+            if self._versions.get(gid, 0) == missing[gid]:
+                if gid in self._entries:
+                    # Reloaded after expiring. Only a change we didn't hear about
+                    # gets a new version, so the index isn't rebuilt needlessly.
+                    _, prev = self._entries[gid]
+                    if _same_flags(prev, entry):
+                        entry = prev
+                    else:
+                        version = self._bump(gid)
+                        if entry is not None:
+                            entry = replace(entry, version=version)
+                self._entries[gid] = (now, entry)
+            if entry is not None:
+                ret[gid] = entry
+        return ret
+
+    def index(self, geofences: Mapping[UUID, CompiledGeofence]) -> GeofenceIndex:
+        """Spatial index covering `geofences`, as returned by `get_many`.
+
+        The index over all loaded geofences is shared by every batch and only
+        rebuilt once a geofence was added, removed or changed version. Geofences
+        that were returned but not stored, because they were written while being
+        loaded, get an index of their own for this batch.
+        """
+        loaded = [entry for _, entry in self._entries.values() if entry is not None]
+        key = frozenset((gf.id, gf.version) for gf in loaded)
+        if key != self._index_key:
+            self._index = GeofenceIndex(loaded)
+            self._index_key = key
+        if all((gf.id, gf.version) in key for gf in geofences.values()):
+            return self._index
+        return GeofenceIndex(geofences.values())
+
+    def put(
+        self,
+        geofence_id: UUID,
+        data: Any,
+        immobilize_enter: bool,
+        immobilize_leave: bool,
+    ) -> None:
+        version = self._bump(geofence_id)
+        _, prev = self._entries.get(geofence_id, (0.0, None))
+        if prev is not None:
+            # The geometry of a geofence can't be edited, only its flags.
+            entry = CompiledGeofence(
+                geofence_id,
+                version,
+                prev.geometry,
+                prev.bounds,
+                immobilize_enter,
+                immobilize_leave,
+            )
+        else:
+            entry = compile_geofence(
+                geofence_id, version, data, immobilize_enter, immobilize_leave
+            )
+        self._entries[geofence_id] = (monotonic(), entry)
+        self._announce(geofence_id)
+
+    def drop(self, geofence_ids: Iterable[UUID]) -> None:
+        """Forgets the geofences on this replica only."""
+        for geofence_id in geofence_ids:
+            self._bump(geofence_id)
+            self._entries.pop(geofence_id, None)
+
+    def invalidate(self, geofence_id: UUID) -> None:
+        self.drop((geofence_id,))
+        self._announce(geofence_id)
+
+    def _announce(self, geofence_id: UUID) -> None:
+        self._announced.add(geofence_id)
+        self._has_announced.set()
+
+    async def next_announced(self) -> list[UUID]:
+        await self._has_announced.wait()
+        self._has_announced.clear()
+        geofence_ids = list(self._announced)
+        self._announced.clear()
+        return geofence_ids
+
+
+def _same_flags(a: CompiledGeofence | None, b: CompiledGeofence | None) -> bool:
+    if a is None or b is None:
+        return a is b
+    return (a.immobilize_enter, a.immobilize_leave) == (
+        b.immobilize_enter,
+        b.immobilize_leave,
+    )
+
+
+async def get_geofence_cache_from_fastapi(app: FastAPI) -> GeofenceCache:
+    cache: GeofenceCache = app.state.geofence_cache
+    return cache
+
+
+async def get_geofence_cache(request: Request) -> GeofenceCache:
+    return await get_geofence_cache_from_fastapi(request.app)
+
+
+GetGeofenceCache = Annotated[GeofenceCache, Depends(get_geofence_cache)]
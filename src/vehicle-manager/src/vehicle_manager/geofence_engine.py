@@ -0,0 +1,71 @@
+from collections import defaultdict
+from collections.abc import Collection, Mapping, Sequence
+from dataclasses import dataclass
+from uuid import UUID
+
+import numpy as np
+import shapely
+
+from vehicle_manager.geofence_cache import CompiledGeofence, GeofenceIndex
+
+
+@dataclass(frozen=True)
+class Transition:
+    row: int
+    geofence: CompiledGeofence
+    entered: bool
+
+
+class GeofenceEngine:
+    """Evaluates geofence transitions for many position updates at once.
+
+    Candidate (row, geofence) pairs come from a bounding box index query over all
+    points, then the exact containment tests run per geofence with shapely's
+    vectorized `contains_xy` over every row that can touch it. The index may hold
+    more geofences than are assigned to the vehicles, e.g. the one shared through
+    `GeofenceCache.index`.
+    """
+
+    def __init__(self, index: GeofenceIndex) -> None:
+        self._index = index
+
+    def evaluate(
+        self,
+        vehicle_ids: Sequence[UUID],
+        prev: np.ndarray,
+        curr: np.ndarray,
+        assignments: Mapping[UUID, Collection[UUID]],
+    ) -> list[Transition]:
+        """Transitions for each row, where row `i` is vehicle `vehicle_ids[i]`
+        moving from `prev[i]` to `curr[i]`.
+
+        Positions are `(lon, lat)` arrays of shape `(n, 2)`, with NaN for an
+        unknown previous position. Only geofences in `assignments[vehicle_id]` are
+        considered. The result is ordered by row.
+        """
+        n = len(vehicle_ids)
+        if n == 0 or not self._index.geofences:
+            return []
+
+        points = np.concatenate([prev, curr])
+        known = np.flatnonzero(np.isfinite(points).all(axis=1))
+        hit_points, hit_geofences = self._index.query(
+            points[known, 0], points[known, 1]
+        )
+
+        rows_by_geofence: dict[int, set[int]] = defaultdict(set)
+        for point, gi in zip(known[hit_points] % n, hit_geofences):
+            if self._index.geofences[gi].id in assignments.get(vehicle_ids[point], ()):
+                rows_by_geofence[int(gi)].add(int(point))
+
+        transitions: list[Transition] = []
+        for gi, row_set in rows_by_geofence.items():
+            gf = self._index.geofences[gi]
+            rows = np.fromiter(row_set, dtype=np.intp, count=len(row_set))
+            curr_inside = shapely.contains_xy(gf.geometry, curr[rows, 0], curr[rows, 1])
+            prev_inside = shapely.contains_xy(gf.geometry, prev[rows, 0], prev[rows, 1])
+            for i in np.flatnonzero(curr_inside != prev_inside):
+                transitions.append(Transition(int(rows[i]), gf, bool(curr_inside[i])))
+
+        transitions.sort(key=lambda t: t.row)
+        return transitions
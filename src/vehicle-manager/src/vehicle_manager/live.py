@@ -0,0 +1,185 @@
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Annotated, Literal
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, FastAPI, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from vehicle_manager.auth import AUTH_RESPONSES_DICT, get_user_id
+
+
+class LivePos(BaseModel):
+    type: Literal["pos"] = "pos"
+    vehicle_id: UUID
+    ts: datetime
+    lat: float
+    lon: float
+
+
+class LiveImmobilizer(BaseModel):
+    type: Literal["immobilizer"] = "immobilizer"
+    vehicle_id: UUID
+    ts: datetime
+    immobilized: bool
+
+
+class LiveGeofence(BaseModel):
+    type: Literal["geofence"] = "geofence"
+    vehicle_id: UUID
+    ts: datetime
+    geofence_id: UUID
+    entered: bool
+
+
+LiveUpdate = LivePos | LiveImmobilizer | LiveGeofence
+
+
+class LiveSubscription:
+    """Updates waiting to be sent to one client.
+
+    Only the newest position of each vehicle is kept, so a client that is slower
+    than the telemetry skips positions instead of falling behind. Other updates
+    are queued up to `max_events`, beyond which the oldest are dropped.
+    """
+
+    def __init__(self, vehicle_ids: frozenset[UUID] | None, max_events: int) -> None:
+        self._vehicle_ids = vehicle_ids
+        self._positions: dict[UUID, LivePos] = {}
+        self._events = deque[LiveUpdate](maxlen=max_events)
+        self._ready = asyncio.Event()
+
+    def offer(self, update: LiveUpdate) -> bool:
+        """Queues the update if the client wants it. Returns whether an older
+        event had to be dropped for it."""
+        if self._vehicle_ids is not None and update.vehicle_id not in self._vehicle_ids:
+            return False
+        dropped = False
+        if isinstance(update, LivePos):
+            self._positions[update.vehicle_id] = update
+        else:
+            dropped = len(self._events) == self._events.maxlen
+            self._events.append(update)
+        self._ready.set()
+        return dropped
+
+    async def next_updates(self, timeout: float) -> list[LiveUpdate]:
+        """Everything pending, after waiting up to `timeout` seconds for it."""
+        try:
+            async with asyncio.timeout(timeout):
+                await self._ready.wait()
+        except TimeoutError:
+            return []
+        self._ready.clear()
+        updates: list[LiveUpdate] = [*self._events, *self._positions.values()]
+        self._events.clear()
+        self._positions.clear()
+        return updates
+
+
+class LiveHub:
+    """Fans out live vehicle updates to connected clients.
+
+    Positions and immobilizer updates come straight from the controllers'
+    status messages. Geofence transitions are only known to the replica that
+    ingested the position, so they are announced over NATS for every replica's
+    hub to pick up (see `run_live_feed`).
+    """
+
+    def __init__(self, max_announced: int) -> None:
+        self._subscriptions = set[LiveSubscription]()
+        self._announced = deque[LiveGeofence](maxlen=max_announced)
+        self._has_announced = asyncio.Event()
+        # Events dropped for slow clients, and transitions dropped before they
+        # could be announced.
+        self.dropped = 0
+        self.dropped_announced = 0
+
+    @property
+    def clients(self) -> int:
+        return len(self._subscriptions)
+
+    @contextmanager
+    def subscribe(
+        self, vehicle_ids: frozenset[UUID] | None, max_events: int
+    ) -> Iterator[LiveSubscription]:
+        sub = LiveSubscription(vehicle_ids, max_events)
+        self._subscriptions.add(sub)
+        try:
+            yield sub
+        finally:
+            self._subscriptions.discard(sub)
+
+    def publish(self, update: LiveUpdate) -> None:
+        for sub in self._subscriptions:
+            if sub.offer(update):
+                self.dropped += 1
+
+    def announce(self, update: LiveGeofence) -> None:
+        """Queues a transition to be published to all replicas. Never waits."""
+        if len(self._announced) == self._announced.maxlen:
+            self.dropped_announced += 1
+        self._announced.append(update)
+        self._has_announced.set()
+
+    async def next_announced(self) -> list[LiveGeofence]:
+        await self._has_announced.wait()
+        self._has_announced.clear()
+        updates = list(self._announced)
+        self._announced.clear()
+        return updates
+
+
+async def get_live_hub_from_fastapi(app: FastAPI) -> LiveHub:
+    hub: LiveHub = app.state.live_hub
+    return hub
+
+
+async def get_live_hub(request: Request) -> LiveHub:
+    return await get_live_hub_from_fastapi(request.app)
+
+
+GetLiveHub = Annotated[LiveHub, Depends(get_live_hub)]
+
+
+router = APIRouter(
+    dependencies=[Depends(get_user_id)],
+    responses=AUTH_RESPONSES_DICT,
+)
+
+_KEEPALIVE_INTERVAL = 15.0
+
+
+@router.get("/live", response_class=StreamingResponse)
+async def live_updates(
+    hub: GetLiveHub,
+    vehicle_ids: Annotated[list[UUID] | None, Query(max_length=1000)] = None,
+    interval: Annotated[float, Query(ge=0.2, le=60.0)] = 1.0,
+    max_events: Annotated[int, Query(ge=1, le=10000)] = 1000,
+) -> StreamingResponse:
+    """Server-sent events with live updates of the given vehicles, or of all of
+    them. Updates are sent in bursts at most every `interval` seconds, with only
+    the newest position of each vehicle."""
+    ids = frozenset(vehicle_ids) if vehicle_ids else None
+
+    async def stream() -> AsyncIterator[str]:
+        with hub.subscribe(ids, max_events) as sub:
+            while True:
+                updates = await sub.next_updates(_KEEPALIVE_INTERVAL)
+                if not updates:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "".join(
+                    f"event: {u.type}\ndata: {u.model_dump_json()}\n\n" for u in updates
+                )
+                await asyncio.sleep(interval)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
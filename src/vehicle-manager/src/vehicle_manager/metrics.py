@@ -0,0 +1,74 @@
+from collections import defaultdict
+from collections.abc import Callable
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+type _Labels = tuple[tuple[str, str], ...]
+
+_PREFIX = "vehicle_manager_"
+
+
+class Metrics:
+    """Minimal process-local registry of counters and gauges, exposed in the
+    Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._counters: dict[str, dict[_Labels, float]] = defaultdict(dict)
+        self._callbacks: dict[tuple[str, str], dict[_Labels, Callable[[], float]]] = (
+            defaultdict(dict)
+        )
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self._counters[name][key] = self._counters[name].get(key, 0) + value
+
+    def gauge(self, name: str, fn: Callable[[], float], **labels: str) -> None:
+        """Registers `fn` to be called for the gauge's value on every scrape."""
+        self._callbacks[name, "gauge"][tuple(sorted(labels.items()))] = fn
+
+    def counter(self, name: str, fn: Callable[[], float], **labels: str) -> None:
+        """Like `gauge`, for a counter kept by someone else."""
+        self._callbacks[name, "counter"][tuple(sorted(labels.items()))] = fn
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for name, series in sorted(self._counters.items()):
+            lines += _render_series(name, "counter", series)
+        for (name, kind), fns in sorted(self._callbacks.items()):
+            series = {labels: fn() for labels, fn in fns.items()}
+            lines += _render_series(name, kind, series)
+        return "\n".join(lines) + "\n"
+
+
+def _render_series(name: str, kind: str, series: dict[_Labels, float]) -> list[str]:
+    lines = [f"# TYPE {_PREFIX}{name} {kind}"]
+    for labels, value in series.items():
+        label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(
+            f"{_PREFIX}{name}{{{label_str}}} {value}"
+            if labels
+            else f"{_PREFIX}{name} {value}"
+        )
+    return lines
+
+
+async def get_metrics_from_fastapi(app: FastAPI) -> Metrics:
+    metrics: Metrics = app.state.metrics
+    return metrics
+
+
+async def get_metrics(request: Request) -> Metrics:
+    return await get_metrics_from_fastapi(request.app)
+
+
+GetMetrics = Annotated[Metrics, Depends(get_metrics)]
+
+
+router = APIRouter()
+
+
+@router.get("", response_class=PlainTextResponse)
+async def scrape(metrics: GetMetrics) -> str:
+    return metrics.render()
@@ -0,0 +1,31 @@
+import base64
+from typing import Annotated
+
+from fastapi import Query
+from pydantic import BaseModel, TypeAdapter
+
+from vehicle_manager.errors import InvalidCursorError
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+PageSize = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+
+
+class Page[T](BaseModel):
+    items: list[T]
+    # Pass as `cursor` to get the next page, None on the last page.
+    next_cursor: str | None
+
+
+def encode_cursor[K](adapter: TypeAdapter[K], key: K) -> str:
+    """Opaque token for the sort key of the last item on a page."""
+    return base64.urlsafe_b64encode(adapter.dump_json(key)).decode("ascii")
+
+
+def decode_cursor[K](adapter: TypeAdapter[K], cursor: str) -> K:
+    try:
+        return adapter.validate_json(base64.urlsafe_b64decode(cursor))
+    except ValueError:
+        # Also covers bad base64 and keys that don't validate.
+        raise InvalidCursorError()
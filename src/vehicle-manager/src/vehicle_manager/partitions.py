@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from datetime import UTC, date, datetime, time, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from vehicle_manager.db.core import DatabaseSessionManager
+from vehicle_manager.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Tables range-partitioned by `ts`, one partition per UTC day. Rows outside of
+# every partition land in the table's `_default` partition.
+PARTITIONED_TABLES = ("vehicle_pos", "vehicle_geofence_event")
+
+
+def partition_name(table: str, day: date) -> str:
+    return f"{table}_p{day:%Y%m%d}"
+
+
+def partition_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, time(), UTC)
+    return start, start + timedelta(days=1)
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> set[str]:
+    stmt = text(
+        "SELECT c.relname FROM pg_inherits i"
+        " JOIN pg_class c ON c.oid = i.inhrelid"
+        " WHERE i.inhparent = CAST(:table AS regclass)"
+    )
+    return set(await conn.scalars(stmt, {"table": table}))
+
+
+async def ensure_partitions(conn: AsyncConnection, first_day: date, days: int):
+    """Creates the missing daily partitions from `first_day` up to `days` days
+    after it."""
+    # Replicas start at the same time, so only one of them gets to do this.
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('partitions'))"))
+    for table in PARTITIONED_TABLES:
+        existing = await list_partitions(conn, table)
+        for i in range(days + 1):
+            day = first_day + timedelta(days=i)
+            name = partition_name(table, day)
+            if name in existing:
+                continue
+            start, end = partition_bounds(day)
+            stmt = text(
+                f"CREATE TABLE {name} PARTITION OF {table}"
+                f" FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(stmt)
+            except DBAPIError as e:
+                # Fails if the default partition already holds rows for the day,
+                # which stay there until someone moves them.
+                logger.warning("Could not create partition %s.", name, exc_info=e)
+                continue
+            logger.info("Created partition %s.", name)
+
+
+async def run_partition_manager(
+    db_session_manager: DatabaseSessionManager,
+    settings: Settings,
+):
+    while True:
+        async with db_session_manager.connect() as conn:
+            await ensure_partitions(
+                conn, datetime.now(UTC).date(), settings.partition_premake_days
+            )
+        await asyncio.sleep(settings.partition_check_interval)
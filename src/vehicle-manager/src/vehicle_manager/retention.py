@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import time
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from vehicle_manager.db.core import DatabaseSessionManager
+from vehicle_manager.db.models import RetentionWatermark, VehiclePos
+from vehicle_manager.metrics import Metrics
+from vehicle_manager.partitions import list_partitions, partition_bounds
+from vehicle_manager.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+_DOWNSAMPLE_JOB = "vehicle_pos_downsample"
+_DROP_ATTEMPTS = 5
+
+
+def _floor(ts: datetime, interval: float) -> datetime:
+    return datetime.fromtimestamp(ts.timestamp() // interval * interval, UTC)
+
+
+async def downsample_watermark(
+    conn: AsyncConnection | AsyncSession,
+) -> datetime | None:
+    """Positions before this have been downsampled."""
+    return await conn.scalar(
+        select(RetentionWatermark.ts).where(RetentionWatermark.job == _DOWNSAMPLE_JOB)
+    )
+
+
+async def _try_lock(conn: AsyncConnection) -> bool:
+    """Makes sure only one replica works on retention at a time. Held until the
+    transaction ends."""
+    return bool(
+        await conn.scalar(
+            text("SELECT pg_try_advisory_xact_lock(hashtext('retention'))")
+        )
+    )
+
+
+async def drop_expired_positions(
+    conn: AsyncConnection, cutoff: datetime, chunk_size: int, lock_timeout: float
+) -> int | None:
+    """Removes positions older than `cutoff` in one small step. Returns how many
+    rows went away, 0 once there is nothing left to do, or None if the step has
+    to be retried later."""
+    # Whole days go by dropping their partition, which is instant once it has
+    # the lock on the table. Waiting for that lock queues every insert behind
+    # it, so it only waits for `lock_timeout` seconds.
+    for name in sorted(await list_partitions(conn, VehiclePos.__tablename__)):
+        if name.endswith("_default"):
+            continue
+        day = datetime.strptime(name.rsplit("_p", 1)[-1], "%Y%m%d").date()
+        if partition_bounds(day)[1] > cutoff:
+            continue
+        # The planner's estimate is good enough for the metrics.
+        count = await conn.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"),
+            {"name": name},
+        )
+        try:
+            async with conn.begin_nested():
+                await conn.execute(
+                    text(f"SET LOCAL lock_timeout = '{round(lock_timeout * 1000)}ms'")
+                )
+                await conn.execute(text(f"DROP TABLE {name}"))
+        except DBAPIError as e:
+            logger.info("Could not drop partition %s yet.", name, exc_info=e)
+            return None
+        logger.info("Dropped partition %s.", name)
+        return max(count or 0, 1)
+
+    # Whatever ended up in the default partition is deleted row by row.
+    expired = (
+        select(VehiclePos.vehicle_id, VehiclePos.ts)
+        .where(VehiclePos.ts < cutoff)
+        .limit(chunk_size)
+    )
+    stmt = delete(VehiclePos).where(
+        tuple_(VehiclePos.vehicle_id, VehiclePos.ts).in_(expired)
+    )
+    return (await conn.execute(stmt)).rowcount
+
+
+async def downsample_positions(
+    conn: AsyncConnection,
+    start: datetime,
+    end: datetime,
+    interval: float,
+    chunk_size: int,
+) -> int:
+    """Thins out the positions between `start` and `end` towards only the first
+    per vehicle in every `interval` seconds, deleting at most `chunk_size` rows.
+    Returns the number of deleted rows, less than `chunk_size` once done."""
+    bucket = func.floor(func.extract("epoch", VehiclePos.ts) / interval)
+    ranked = (
+        select(
+            VehiclePos.vehicle_id,
+            VehiclePos.ts,
+            func.row_number()
+            .over(
+                partition_by=(VehiclePos.vehicle_id, bucket),
+                order_by=VehiclePos.ts,
+            )
+            .label("rn"),
+        )
+        .where(VehiclePos.ts >= start, VehiclePos.ts < end)
+        .subquery()
+    )
+    redundant = (
+        select(ranked.c.vehicle_id, ranked.c.ts)
+        .where(ranked.c.rn > 1)
+        .limit(chunk_size)
+    )
+    stmt = delete(VehiclePos).where(
+        VehiclePos.ts >= start,
+        VehiclePos.ts < end,
+        tuple_(VehiclePos.vehicle_id, VehiclePos.ts).in_(redundant),
+    )
+    return (await conn.execute(stmt)).rowcount
+
+
+async def run_retention_job(
+    db_session_manager: DatabaseSessionManager,
+    settings: Settings,
+    metrics: Metrics,
+):
+    """Enforces the position retention policy: full resolution for
+    `pos_full_resolution_days`, then one point per `pos_downsample_interval`
+    until `pos_retention_days`, then nothing. Either part is skipped if unset.
+
+    Every step is its own short transaction over at most `pos_retention_window`
+    seconds and `pos_retention_chunk_size` rows, so ingest is never blocked for
+    long. Steps take an advisory lock, and a replica that finds another one busy
+    leaves the pass to it. Downsampling progress is kept in a watermark, so a
+    restart resumes where it left off.
+    """
+    interval = settings.pos_downsample_interval
+    chunk_size = settings.pos_retention_chunk_size
+    # Windows are whole buckets, so no bucket is split between two of them.
+    window = timedelta(
+        seconds=max(1, round(settings.pos_retention_window / interval)) * interval
+    )
+    rate = 0.0
+    metrics.gauge("pos_retention_rows_per_second", lambda: rate)
+
+    if (
+        settings.pos_retention_days is None
+        and settings.pos_full_resolution_days is None
+    ):
+        logger.info("Position retention is disabled.")
+        await asyncio.Future()
+
+    while True:
+        now = datetime.now(UTC)
+        drop_cutoff = (
+            now - timedelta(days=settings.pos_retention_days)
+            if settings.pos_retention_days is not None
+            else None
+        )
+        rows = 0
+        busy = 0.0
+        attempts = 0
+
+        while drop_cutoff is not None:
+            started = time.monotonic()
+            async with db_session_manager.connect() as conn:
+                n = (
+                    await drop_expired_positions(
+                        conn,
+                        drop_cutoff,
+                        chunk_size,
+                        settings.pos_retention_lock_timeout,
+                    )
+                    if await _try_lock(conn)
+                    else 0
+                )
+            busy += time.monotonic() - started
+            if n is None:
+                # Someone held the table for too long. Give them room, and leave
+                # the partition to the next pass if it keeps happening.
+                attempts += 1
+                if attempts >= _DROP_ATTEMPTS:
+                    break
+                await asyncio.sleep(settings.pos_retention_pause * 10)
+                continue
+            if not n:
+                break
+            rows += n
+            metrics.inc("pos_retention_rows_total", n, action="dropped")
+            await asyncio.sleep(settings.pos_retention_pause)
+
+        while settings.pos_full_resolution_days is not None:
+            downsample_cutoff = _floor(
+                now - timedelta(days=settings.pos_full_resolution_days), interval
+            )
+            started = time.monotonic()
+            async with db_session_manager.connect() as conn:
+                if not await _try_lock(conn):
+                    break
+                watermark = await downsample_watermark(conn)
+                if watermark is None:
+                    oldest = await conn.scalar(select(func.min(VehiclePos.ts)))
+                    if oldest is None:
+                        break
+                    watermark = _floor(oldest, interval)
+                # Nothing older than the drop cutoff is left to downsample.
+                start = (
+                    max(watermark, _floor(drop_cutoff, interval))
+                    if drop_cutoff is not None
+                    else watermark
+                )
+                if start >= downsample_cutoff:
+                    break
+                end = min(start + window, downsample_cutoff)
+
+                n = await downsample_positions(conn, start, end, interval, chunk_size)
+                # A full chunk may have left more behind in the same window.
+                if n < chunk_size:
+                    await conn.execute(
+                        pg_insert(RetentionWatermark)
+                        .values(job=_DOWNSAMPLE_JOB, ts=end)
+                        .on_conflict_do_update(
+                            index_elements=[RetentionWatermark.job], set_={"ts": end}
+                        )
+                    )
+            busy += time.monotonic() - started
+            rows += n
+            metrics.inc("pos_retention_rows_total", n, action="downsampled")
+            await asyncio.sleep(settings.pos_retention_pause)
+
+        # Pauses between steps are left out, so this is the speed of the work
+        # itself.
+        rate = rows / busy if busy > 0 else 0.0
+        if rows:
+            logger.info(
+                "Retention pass removed %d positions in %.1fs (%.0f rows/s).",
+                rows,
+                busy,
+                rate,
+            )
+        await asyncio.sleep(settings.pos_retention_check_interval)
@@ -1,4 +1,4 @@
-from typing import Annotated
+from typing import Annotated, Literal
 
 from fastapi import Depends, Request
 from pydantic import computed_field
@@ -25,6 +25,62 @@ class Settings(DatabaseSettings, BaseSettings):
     nats_url: str
     subject_base: str
 
+    # Telemetry is written in batches of up to this many messages, waiting at most
+    # this many seconds for a batch to fill up. A size of 1 processes each message
+    # in its own transaction.
+    telemetry_batch_size: int = 500
+    telemetry_batch_window: float = 0.1
+
+    # Telemetry is split between this many consumers by vehicle id. Messages of a
+    # single vehicle are always handled in order by the same consumer.
+    telemetry_shards: int = 4
+    # Once a consumer has this many messages pending, a new position replaces the
+    # vehicle's pending one. The policy decides whether the replaced positions are
+    # still written to the position history (up to a limit per consumer) or dropped.
+    telemetry_shard_queue_size: int = 10000
+    telemetry_overload_policy: Literal["persist", "drop"] = "persist"
+    telemetry_overload_max_persisted: int = 100000
+
+    # Vehicle changes are announced to the controllers from an outbox table, up to
+    # this many at once. The publisher is woken on every commit that adds to it and
+    # otherwise checks for leftovers every this many seconds.
+    veh_delta_batch_size: int = 500
+    veh_delta_poll_interval: float = 5.0
+
+    # Position history is partitioned by day. Partitions are created this many
+    # days ahead, checking every this many seconds.
+    partition_premake_days: int = 7
+    partition_check_interval: float = 3600.0
+
+    # Positions are kept at full resolution for this many days, then thinned out
+    # to one per vehicle and interval in seconds, and dropped after the retention
+    # period. Both are off unless set, since they delete history for good. The
+    # job works through at most a window of this many seconds, and deletes at
+    # most this many rows, per transaction and pauses between them. Dropping a
+    # partition gives up after waiting this many seconds for its lock, so it
+    # never holds up ingest for longer.
+    pos_full_resolution_days: int | None = None
+    pos_downsample_interval: float = 60.0
+    pos_retention_days: int | None = None
+    pos_retention_window: float = 600.0
+    pos_retention_chunk_size: int = 10000
+    pos_retention_pause: float = 0.1
+    pos_retention_lock_timeout: float = 0.5
+    pos_retention_check_interval: float = 3600.0
+
+    # Vehicle activity, geofence assignments and geofences are cached for
+    # telemetry ingest. Changes are announced to all replicas, and entries are
+    # reloaded after this many seconds in case an announcement got lost.
+    state_cache_ttl: float = 60.0
+    geofence_cache_ttl: float = 60.0
+
+    # Number of simplified trajectories of past time ranges kept in memory.
+    trajectory_cache_size: int = 1024
+
+    # Geofence transitions waiting to be shared with the live feeds of all
+    # replicas. The oldest are dropped if NATS can't keep up.
+    live_max_announced: int = 10000
+
     @computed_field
     @property
     def sub_veh_base(self) -> str:
@@ -45,6 +101,16 @@ class Settings(DatabaseSettings, BaseSettings):
     def sub_veh_status(self) -> str:
         return f"{self.sub_veh_base}.status"
 
+    @computed_field
+    @property
+    def sub_veh_geofence(self) -> str:
+        return f"{self.sub_veh_base}.geofence"
+
+    @computed_field
+    @property
+    def sub_cache_invalidate(self) -> str:
+        return f"{self.subject_base}.vm.invalidate"
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
@@ -0,0 +1,111 @@
+import asyncio
+from collections.abc import Iterable
+from dataclasses import dataclass
+from time import monotonic
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import Depends, FastAPI, Request
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from vehicle_manager.db.models import Vehicle, VehicleGeofence
+
+
+@dataclass(frozen=True)
+class VehicleState:
+    geofence_ids: frozenset[UUID]
+
+
+class StateCache:
+    """Process-local cache of the rarely changing vehicle state used by telemetry
+    ingest: whether a vehicle is active and which geofences it is assigned to.
+    Inactive or missing vehicles are cached as absent. Positions and the
+    immobilizer state change with every message and are always read from the
+    database, since another replica may have just written them.
+
+    Writers drop entries after their transaction commits (see `on_commit`), and
+    the invalidation is announced over NATS for the other replicas to drop theirs
+    too (see `run_cache_sync`). Entries also expire after `ttl` seconds, in case an
+    announcement is lost. A load that overlaps with an invalidation is returned to
+    the caller but not stored, so it can't resurrect state from before the write.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self._vehicles: dict[UUID, tuple[float, VehicleState | None]] = {}
+        self._generation = 0
+        self._ttl = ttl
+        self._announced = set[UUID]()
+        self._has_announced = asyncio.Event()
+
+    async def get_vehicles(
+        self, db: AsyncSession, vehicle_ids: Iterable[UUID]
+    ) -> dict[UUID, VehicleState]:
+        vehicle_ids = set(vehicle_ids)
+        now = monotonic()
+        ret: dict[UUID, VehicleState] = {}
+        missing: list[UUID] = []
+        for vid in vehicle_ids:
+            entry = self._vehicles.get(vid)
+            if entry is None or now - entry[0] > self._ttl:
+                missing.append(vid)
+            elif entry[1] is not None:
+                ret[vid] = entry[1]
+        if not missing:
+            return ret
+
+        generation = self._generation
+        loaded: dict[UUID, VehicleState | None] = dict.fromkeys(missing)
+
+        vehicles_stmt = select(Vehicle.id).where(
+            and_(Vehicle.id.in_(missing), Vehicle.active.is_(True))
+        )
+        active = list(await db.scalars(vehicles_stmt))
+
+        assignments_stmt = select(
+            VehicleGeofence.vehicle_id, VehicleGeofence.geofence_id
+        ).where(VehicleGeofence.vehicle_id.in_(active))
+        geofence_ids: dict[UUID, set[UUID]] = {vid: set() for vid in active}
+        for vid, gid in (await db.execute(assignments_stmt)).tuples():
+            geofence_ids[vid].add(gid)
+
+        for vid in active:
+            state = VehicleState(frozenset(geofence_ids[vid]))
+            loaded[vid] = state
+            ret[vid] = state
+
+        if generation == self._generation:
+            self._vehicles.update((vid, (now, state)) for vid, state in loaded.items())
+        return ret
+
+    def drop_vehicles(self, vehicle_ids: Iterable[UUID]) -> None:
+        """Forgets the vehicles on this replica only."""
+        self._generation += 1
+        for vehicle_id in vehicle_ids:
+            self._vehicles.pop(vehicle_id, None)
+
+    def invalidate_vehicle(self, vehicle_id: UUID) -> None:
+        """Forgets the vehicle here and queues that to be announced to all
+        replicas. Never waits."""
+        self.drop_vehicles((vehicle_id,))
+        self._announced.add(vehicle_id)
+        self._has_announced.set()
+
+    async def next_announced(self) -> list[UUID]:
+        await self._has_announced.wait()
+        self._has_announced.clear()
+        vehicle_ids = list(self._announced)
+        self._announced.clear()
+        return vehicle_ids
+
+
+async def get_state_cache_from_fastapi(app: FastAPI) -> StateCache:
+    cache: StateCache = app.state.state_cache
+    return cache
+
+
+async def get_state_cache(request: Request) -> StateCache:
+    return await get_state_cache_from_fastapi(request.app)
+
+
+GetStateCache = Annotated[StateCache, Depends(get_state_cache)]
@@ -0,0 +1,54 @@
+import asyncio
+
+from vehicle_manager.batching import CoalescingBatcher
+
+
+def contents(batch):
+    return [(b.key, b.item, b.superseded) for b in batch]
+
+
+def test_batcher_splits_by_size():
+    async def run():
+        batcher = CoalescingBatcher[int, int](3, 10.0, 100, 0)
+        for i in range(7):
+            batcher.put(i, i, True)
+        return [[b.item for b in await batcher.next_batch()] for _ in range(2)]
+
+    assert asyncio.run(run()) == [[0, 1, 2], [3, 4, 5]]
+
+
+def test_batcher_flushes_after_window():
+    async def run():
+        batcher = CoalescingBatcher[int, int](100, 0.01, 100, 0)
+        batcher.put(1, 1, True)
+        batcher.put(2, 2, True)
+        return [b.item for b in await batcher.next_batch()]
+
+    assert asyncio.run(run()) == [1, 2]
+
+
+def test_batcher_coalesces_over_capacity():
+    async def run():
+        batcher = CoalescingBatcher[str, int](100, 0.0, 2, 1)
+        batcher.put("a", 1, True)
+        batcher.put("b", 1, True)
+        batcher.put("a", 2, True)
+        batcher.put("a", 3, True)
+        batcher.put("c", 1, True)
+        return batcher, await batcher.next_batch()
+
+    batcher, batch = asyncio.run(run())
+    assert contents(batch) == [("a", 3, [1]), ("b", 1, []), ("c", 1, [])]
+    assert (batcher.coalesced, batcher.dropped, batcher.superseded) == (2, 1, 0)
+
+
+def test_batcher_does_not_coalesce_across_barrier():
+    async def run():
+        batcher = CoalescingBatcher[str, int](100, 0.0, 1, 10)
+        batcher.put("a", 1, True)
+        batcher.put("a", 2, False)
+        batcher.put("a", 3, True)
+        batcher.put("a", 4, True)
+        return await batcher.next_batch()
+
+    assert contents(asyncio.run(run())) == [("a", 1, []), ("a", 2, []), ("a", 4, [3])]
@@ -0,0 +1,32 @@
+import asyncio
+from uuid import uuid4
+
+from vehicle_manager.command_outbox import CommandOutbox, ImmobilizeCommand
+
+
+def test_outbox_keeps_latest_command_and_retries():
+    v1, v2 = uuid4(), uuid4()
+    sent: list[ImmobilizeCommand] = []
+    attempts = 0
+
+    async def send(cmd: ImmobilizeCommand):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ConnectionError()
+        sent.append(cmd)
+
+    async def run():
+        outbox = CommandOutbox(min_backoff=0.001)
+        outbox.enqueue(ImmobilizeCommand(v1, True, None, None))
+        outbox.enqueue(ImmobilizeCommand(v2, True, None, None))
+        outbox.enqueue(ImmobilizeCommand(v1, False, "user", None))
+        task = asyncio.create_task(outbox.run(send))
+        while outbox.pending:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        return outbox
+
+    outbox = asyncio.run(run())
+    assert [(c.vehicle_id, c.active) for c in sent] == [(v2, True), (v1, False)]
+    assert (outbox.sent, outbox.failed) == (2, 1)
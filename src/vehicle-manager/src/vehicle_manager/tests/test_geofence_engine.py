@@ -0,0 +1,99 @@
+import asyncio
+from math import nan
+from types import SimpleNamespace
+from uuid import uuid4
+
+import numpy as np
+
+from vehicle_manager.geofence_cache import (
+    CompiledGeofence,
+    GeofenceCache,
+    GeofenceIndex,
+    compile_geofence,
+)
+from vehicle_manager.geofence_engine import GeofenceEngine
+
+
+def square(x: float, y: float) -> CompiledGeofence:
+    data = {
+        "type": "Polygon",
+        "coordinates": [[[x, y], [x + 1, y], [x + 1, y + 1], [x, y + 1], [x, y]]],
+    }
+    gf = compile_geofence(uuid4(), 1, data, True, True)
+    assert gf is not None
+    return gf
+
+
+def test_engine_reports_enter_and_leave():
+    gf = square(0, 0)
+    v1, v2, v3 = uuid4(), uuid4(), uuid4()
+
+    transitions = GeofenceEngine(GeofenceIndex([gf])).evaluate(
+        [v1, v2, v1, v3],
+        np.array([[5, 5], [nan, nan], [0.5, 0.5], [5, 5]]),
+        np.array([[0.5, 0.5], [0.5, 0.5], [5, 5], [0.5, 0.5]]),
+        {v1: {gf.id}, v2: {gf.id}},
+    )
+
+    assert [(t.row, t.geofence.id, t.entered) for t in transitions] == [
+        (0, gf.id, True),
+        (1, gf.id, True),
+        (2, gf.id, False),
+    ]
+
+
+def test_engine_uses_tree_for_many_geofences():
+    geofences = [square(i * 2, 0) for i in range(20)]
+    vehicle = uuid4()
+
+    transitions = GeofenceEngine(GeofenceIndex(geofences)).evaluate(
+        [vehicle],
+        np.array([[6.5, 0.5]]),
+        np.array([[10.5, 0.5]]),
+        {vehicle: {gf.id for gf in geofences}},
+    )
+
+    assert {(t.geofence.id, t.entered) for t in transitions} == {
+        (geofences[3].id, False),
+        (geofences[5].id, True),
+    }
+
+
+def test_cache_shares_index_until_a_geofence_changes():
+    gf = square(0, 0)
+    cache = GeofenceCache(ttl=60)
+    cache.put(gf.id, gf.geometry.__geo_interface__, True, True)
+
+    def index() -> GeofenceIndex:
+        # Fresh entries are served without touching the database.
+        return cache.index(asyncio.run(cache.get_many(None, {gf.id})))  # type: ignore[arg-type]
+
+    shared = index()
+    assert index() is shared
+    assert [g.id for g in shared.geofences] == [gf.id]
+
+    cache.put(gf.id, None, False, True)
+    assert index() is not shared
+    assert not index().geofences[0].immobilize_enter
+
+
+def test_cache_indexes_geofences_written_while_loading():
+    gf = square(0, 0)
+    cache = GeofenceCache(ttl=60)
+
+    class Db:
+        async def scalars(self, stmt):
+            # Another request writes the geofence before the load returns.
+            cache.invalidate(gf.id)
+            return [
+                SimpleNamespace(
+                    id=gf.id,
+                    data=gf.geometry.__geo_interface__,
+                    immobilize_enter=True,
+                    immobilize_leave=True,
+                )
+            ]
+
+    geofences = asyncio.run(cache.get_many(Db(), {gf.id}))  # type: ignore[arg-type]
+    assert geofences.keys() == {gf.id}
+    assert [g.id for g in cache.index(geofences).geofences] == [gf.id]
@@ -0,0 +1,39 @@
+import asyncio
+from datetime import UTC, datetime
+from uuid import uuid4
+
+from vehicle_manager.live import LiveGeofence, LiveHub, LivePos
+
+
+def test_subscription_coalesces_positions_and_drops_oldest_events():
+    v1, v2, gf = uuid4(), uuid4(), uuid4()
+    ts = datetime.now(UTC)
+
+    async def run():
+        hub = LiveHub(10)
+        with hub.subscribe(frozenset({v1}), 2) as sub:
+            for i in range(3):
+                hub.publish(LivePos(vehicle_id=v1, ts=ts, lat=i, lon=i))
+                hub.publish(
+                    LiveGeofence(
+                        vehicle_id=v1, ts=ts, geofence_id=gf, entered=i % 2 == 0
+                    )
+                )
+            hub.publish(LivePos(vehicle_id=v2, ts=ts, lat=0, lon=0))
+            # Counted while the slow client is still connected.
+            assert hub.dropped == 1
+            updates = await sub.next_updates(1.0)
+        for _ in range(11):
+            hub.announce(
+                LiveGeofence(vehicle_id=v1, ts=ts, geofence_id=gf, entered=True)
+            )
+        return hub, updates
+
+    hub, updates = asyncio.run(run())
+    assert [(u.type, getattr(u, "entered", None)) for u in updates] == [
+        ("geofence", False),
+        ("geofence", True),
+        ("pos", None),
+    ]
+    assert updates[-1].lat == 2
+    assert (hub.clients, hub.dropped, hub.dropped_announced) == (0, 1, 1)
@@ -0,0 +1,13 @@
+import numpy as np
+
+from vehicle_manager.trajectory import encode_polyline, simplify
+
+
+def test_encode_polyline_reference():
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_simplify_drops_collinear_points():
+    coords = np.array([(0.0, 0.0), (1.0, 0.0001), (2.0, 0.0), (2.0, 2.0)])
+    assert simplify(coords, 0.01).tolist() == [[0.0, 0.0], [2.0, 0.0], [2.0, 2.0]]
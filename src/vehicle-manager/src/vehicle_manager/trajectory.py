@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Annotated
+from uuid import UUID
+
+import numpy as np
+import shapely
+from fastapi import Depends, FastAPI, Request
+from pydantic import BaseModel
+
+
+class TrajectoryRead(BaseModel):
+    # Google encoded polyline of (lat, lon) points with 5 decimals.
+    polyline: str
+    points: int
+    raw_points: int
+    start_ts: datetime | None
+    end_ts: datetime | None
+
+
+def zoom_tolerance(zoom: int) -> float:
+    """Simplification tolerance in degrees for a web map zoom level, about one
+    pixel of a 256 px tile."""
+    return 360 / (256 * 2**zoom)
+
+
+def simplify(coords: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker simplification of `(lon, lat)` points of shape `(n, 2)`."""
+    if len(coords) < 3 or tolerance <= 0:
+        return coords
+    line = shapely.simplify(
+        shapely.linestrings(coords), tolerance, preserve_topology=False
+    )
+    return shapely.get_coordinates(line)
+
+
+def encode_polyline(coords: Iterable[tuple[float, float]], precision: int = 5) -> str:
+    """Encodes `(lat, lon)` points with the Google polyline algorithm, as deltas
+    between consecutive points."""
+    factor = 10**precision
+    out: list[str] = []
+    prev_lat = prev_lon = 0
+    for lat, lon in coords:
+        lat_i, lon_i = round(lat * factor), round(lon * factor)
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(out)
+
+
+# The last part is how far downsampling got within the time range.
+type TrajectoryKey = tuple[UUID, datetime, datetime, float, datetime | None]
+
+
+class TrajectoryCache:
+    """LRU cache of simplified trajectories. Only time ranges that have already
+    ended are stored, since no new positions arrive for them. Retention still
+    thins them out later, so their key includes the downsampling progress, and
+    ranges that may lose positions to the retention period aren't cached."""
+
+    def __init__(self, max_size: int) -> None:
+        self._entries: OrderedDict[TrajectoryKey, TrajectoryRead] = OrderedDict()
+        self._max_size = max_size
+
+    def get(self, key: TrajectoryKey) -> TrajectoryRead | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: TrajectoryKey, trajectory: TrajectoryRead) -> None:
+        self._entries[key] = trajectory
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+
+async def get_trajectory_cache_from_fastapi(app: FastAPI) -> TrajectoryCache:
+    cache: TrajectoryCache = app.state.trajectory_cache
+    return cache
+
+
+async def get_trajectory_cache(request: Request) -> TrajectoryCache:
+    return await get_trajectory_cache_from_fastapi(request.app)
+
+
+GetTrajectoryCache = Annotated[TrajectoryCache, Depends(get_trajectory_cache)]